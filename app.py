@@ -1,91 +1,369 @@
-from flask import Flask, render_template, session, redirect, url_for
-import folium
+from flask import Flask, render_template, session, redirect, url_for, request, abort, Response, g
+from functools import lru_cache
+import gzip
+import hashlib
+import click
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 import json
-import random
+import math
 import os
+import random
+import time
+from geo_catalog import load_catalog
+from map_cache import MapCache
+from metrics import Metrics, DisabledMetrics, Gauge
+from render_pool import RenderPool, PoolSaturated
+from session_state import CountryIndex
+from scheduler import Scheduler, decode_misses
+from session_store import ServerSession, ServerSessionInterface, MemoryStore, SQLiteStore
+from spatial_index import SpatialIndex, load_centroids
+from svg_map import SvgMapRenderer
 
 app = Flask(__name__)
-app.secret_key = "replace_this_with_a_random_secret"
+app.secret_key = os.environ.get("SECRET_KEY", "replace_this_with_a_random_secret")
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 FLAGS_FOLDER = os.path.join(BASE_DIR, "country-flags-main", "png")
-GEOJSON_FILE = os.path.join(BASE_DIR, "country_outlines", "countries.geojson")
+GEOJSON_FILE = os.environ.get("GEOJSON_FILE", os.path.join(BASE_DIR, "country_outlines", "countries.geojson"))
+CENTROIDS_FILE = os.path.join(BASE_DIR, "country_outlines", "countries_centroids.geojson")
 COUNTRIES_JSON = os.path.join(BASE_DIR, "country-flags-main", "countries.json")
+FLAG_MANIFEST = os.path.join(BASE_DIR, "static", "flags", "variants", "manifest.json")
+FLAG_ATLAS = os.path.join(BASE_DIR, "static", "flags", "atlas", "atlas.json")
+
+app.logger.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
+# METRICS=0 turns instrumentation off: no request hooks, no /metrics and no-op stages
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS = Metrics() if METRICS_ENABLED else DisabledMetrics()
+
+# Game progress is kept in the signed session cookie by default. SESSION_BACKEND=sqlite
+# keeps it in a database shared by all workers and only stores an ID in the cookie.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cookie")
+if SESSION_BACKEND == "sqlite":
+    app.session_interface = ServerSessionInterface(SQLiteStore(os.environ.get("SESSION_DB", os.path.join(BASE_DIR, "sessions.sqlite3"))))
+elif SESSION_BACKEND == "memory":
+    app.session_interface = ServerSessionInterface(MemoryStore())
+
+# Data files are loaded on first use, or up front by preload() in the gunicorn
+# master (see gunicorn.conf.py) so that forked workers share them
+
+
+@lru_cache(maxsize=None)
+def get_countries():
+    """Return a dict mapping lower-case ISO codes to country names"""
+    with open(COUNTRIES_JSON, "r", encoding="utf-8") as f:
+        return {k.lower(): v for k, v in json.load(f).items()}
+
+
+@lru_cache(maxsize=None)
+def get_country_index():
+    """Return the bit positions of the countries in the session's remaining-country set"""
+    return CountryIndex(get_countries().keys())
+
+
+@lru_cache(maxsize=None)
+def get_flag_variants():
+    """Return the resized flag variants written by build_flags.py, if present"""
+    if not os.path.exists(FLAG_MANIFEST):
+        return {}
+    with open(FLAG_MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-# Load country names
-with open(COUNTRIES_JSON, "r", encoding="utf-8") as f:
-    COUNTRIES = {k.lower(): v for k, v in json.load(f).items()}
 
-# Load GeoJSON
-with open(GEOJSON_FILE, "r", encoding="utf-8") as f:
-    GEOJSON = json.load(f)
+@lru_cache(maxsize=None)
+def get_flag_atlas():
+    """Return the thumbnail atlas and look-alike table written by build_flag_atlas.py, if present"""
+    if not os.path.exists(FLAG_ATLAS):
+        return None
+    with open(FLAG_ATLAS, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_catalog():
+    """Return the country outlines, indexed by ISO code"""
+    return load_catalog(GEOJSON_FILE)
+
+
+@lru_cache(maxsize=None)
+def get_spatial_index():
+    """Return the index answering which country contains a point, see spatial_index.py"""
+    centroids = load_centroids(CENTROIDS_FILE) if os.path.exists(CENTROIDS_FILE) else {}
+    return SpatialIndex(get_catalog(), centroids)
+
+
+def preload():
+    """Load all data files now and log how long it took"""
+    start = time.perf_counter()
+    countries = get_countries()
+    get_country_index()
+    get_flag_variants()
+    get_flag_atlas()
+    catalog = get_catalog()
+    get_spatial_index()
+    elapsed = (time.perf_counter() - start) * 1000
+    app.logger.info("Loaded %d countries and %d outlines in %.1f ms", len(countries), len(catalog), elapsed)
+
+
+@lru_cache(maxsize=None)
+def get_svg_renderer():
+    return SvgMapRenderer(get_catalog())
 
 
 def get_country_coords(country_iso):
-    """Return GeoJSON coordinates for a country"""
-    for feature in GEOJSON["features"]:
-        if feature["properties"]["ISO3166-1-Alpha-2"].upper() == country_iso.upper():
-            coords = feature["geometry"]["coordinates"]
-            if feature["geometry"]["type"] == "Polygon":
-                coords = [coords]
-            # Apply shifts if needed
-            if country_iso.lower() in ["ru", "nz", "fj"]:
-                coords = shift_russia(coords)
-            if country_iso.lower() == "us":
-                coords = shift_usa(coords)
-
-            xmin = ymin = float("inf")
-            xmax = ymax = float("-inf")
-            for part in coords:
-                for p in part:
-                    lons = [point[0] for point in p]
-                    lats = [point[1] for point in p]
-                    xmin, xmax = min(xmin, min(lons)), max(xmax, max(lons))
-                    ymin, ymax = min(ymin, min(lats)), max(ymax, max(lats))
-            return coords, (xmin, xmax, ymin, ymax)
-    return []
-
-
-def shift_usa(coords):
-    for part in coords:
-        for poly in part:
-            for point in poly:
-                point[0] -= 340
-                point[0] = point[0] % 360
-                point[0] -= 380
-    return coords
-
-
-def shift_russia(coords):
-    for part in coords:
-        for poly in part:
-            for point in poly:
-                point[0] -= 340
-                point[0] = point[0] % 360
-                point[0] -= 20
-    return coords
+    """Return shifted GeoJSON coordinates and bounds for a country"""
+    geometry = get_catalog().get(country_iso.lower())
+    if geometry is None:
+        return [], None
+    return geometry.coords(), geometry.bounds
 
 
 def generate_map(country_iso):
-    coords_list, (xmin, xmax, ymin, ymax) = get_country_coords(country_iso)
-    if not coords_list:
+    # folium is slow to import and only needed for MAP_MODE=folium
+    import folium
+
+    with METRICS.stage("geometry_lookup"):
+        geometry = get_catalog().get(country_iso.lower())
+    if geometry is None:
         return "<p>Map not found</p>"
+    with METRICS.stage("shift"):
+        bounds = geometry.bounds
+    if bounds is None:
+        return "<p>Map not found</p>"
+    with METRICS.stage("simplify"):
+        view_geometry = geometry.view_geometry
+
+    with METRICS.stage("folium_build"):
+        xmin, xmax, ymin, ymax = bounds
+        m = folium.Map(location=geometry.center, zoom_start=5, tiles="cartodb positron")
+        m.fit_bounds([[ymin, xmin], [ymax, xmax]])
+        for polygon in view_geometry.rings():
+            for poly in polygon:
+                folium.Polygon(locations=poly[:, ::-1].tolist(), color="blue", weight=2, fill=True, fill_color="#55ff00").add_to(m)
+
+    with METRICS.stage("folium_html"):
+        return m._repr_html_()
+
+
+def generate_svg_map(country_iso):
+    with METRICS.stage("svg_render"):
+        return get_svg_renderer().render(country_iso)
+
+
+# "leaflet" draws the map in the browser from /api/country/<iso>/geometry,
+# "folium" inlines a server-rendered folium map into the page and "svg" an
+# offline SVG outline that needs no tiles or JavaScript
+MAP_MODE = os.environ.get("MAP_MODE", "leaflet")
+MAP_RENDERERS = {"folium": (generate_map, ".html"), "svg": (generate_svg_map, ".svg")}
+
+# GUESS_MODE=1 lets players click where they think the country is before it is
+# revealed, answered by /api/guess (leaflet map mode only)
+GUESS_MODE = os.environ.get("GUESS_MODE", "0") == "1"
+
+# Decimal places kept in geometry responses (4 decimals is about 10 m)
+GEOMETRY_PRECISION = 4
+
+# RENDER_WORKERS=n renders maps in a pool of n processes instead of the request thread,
+# at most RENDER_QUEUE different countries at a time; run gunicorn with GUNICORN_THREADS
+# above 1 so that other requests are served while a map renders
+_map_render, _map_suffix = MAP_RENDERERS.get(MAP_MODE, MAP_RENDERERS["folium"])
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 0))
+RENDER_POOL = None
+
+
+def init_render_process():
+    """Load what the renderer needs before a render process takes its first map
+
+    Only the outlines: the flags, the atlas and the spatial index are used by
+    the request handlers, not by the renderers, and would only cost memory here.
+    """
+    get_catalog()
+    if MAP_MODE == "folium":
+        import folium  # noqa: F401
+    elif MAP_MODE == "svg":
+        get_svg_renderer()
+
+
+if RENDER_WORKERS > 0:
+    RENDER_POOL = RenderPool(_map_render, RENDER_WORKERS, max_pending=int(os.environ.get("RENDER_QUEUE", 2 * RENDER_WORKERS)), initializer=init_render_process)
+
+# Rendered map markup per country, optionally backed by a directory shared between workers
+MAP_CACHE = MapCache(RENDER_POOL.render if RENDER_POOL is not None else _map_render, maxsize=int(os.environ.get("MAP_CACHE_SIZE", 64)), directory=os.environ.get("MAP_CACHE_DIR"), suffix=_map_suffix)
+
+
+def render_page(**context):
+    # With a server-side session backend the game can be continued elsewhere from this link
+    session_id = getattr(session, "session_id", None)
+    resume_url = url_for("resume", session_id=session_id, _external=True) if session_id else None
+    with METRICS.stage("template"):
+        return render_template("index.html", map_mode=MAP_MODE, guess_mode=GUESS_MODE, resume_url=resume_url, **context)
+
+
+def cache_counters():
+    """Return the counters of the map and geometry caches, labelled for /metrics"""
+    counters = {(("cache", "map"), ("counter", key)): value for key, value in MAP_CACHE.stats().items()}
+    info = geometry_bodies.cache_info()
+    counters[(("cache", "geometry"), ("counter", "hits"))] = info.hits
+    counters[(("cache", "geometry"), ("counter", "misses"))] = info.misses
+    counters[(("cache", "geometry"), ("counter", "size"))] = info.currsize
+    if RENDER_POOL is not None:
+        for key, value in RENDER_POOL.stats().items():
+            counters[(("cache", "render_pool"), ("counter", key))] = value
+    return counters
+
+
+if METRICS_ENABLED:
+    METRICS.registry.add(Gauge("flagpuzzle_cache", "Hit, miss and size counters of the map and geometry caches.", cache_counters))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        if "request_start" in g:
+            METRICS.request_seconds.observe(time.perf_counter() - g.request_start, route=route, status=response.status_code)
+        if not response.is_streamed and not response.direct_passthrough:
+            METRICS.response_bytes.observe(response.calculate_content_length() or 0, route=route)
+        # The session cookie is written after these hooks run, so record the one the client sent
+        session_cookie = request.cookies.get(app.config["SESSION_COOKIE_NAME"])
+        if session_cookie is not None:
+            METRICS.session_bytes.observe(len(session_cookie))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(METRICS.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.errorhandler(PoolSaturated)
+def render_pool_saturated(error):
+    # Refuse right away rather than queue behind renders that are already running
+    app.logger.warning("Map render refused: %s", error)
+    response = Response("Busy rendering maps, please try again.", status=503, mimetype="text/plain")
+    response.headers["Retry-After"] = "1"
+    return response
 
-    # Center map on first point
-    first = coords_list[0][0][0]
-    m = folium.Map(location=[first[1], first[0]], zoom_start=5, tiles="cartodb positron")
-    m.fit_bounds([[ymin, xmin], [ymax, xmax]])
-    for polygon in coords_list:
-        for poly in polygon:
-            folium.Polygon(locations=[(pt[1], pt[0]) for pt in poly], color="blue", weight=2, fill=True, fill_color="#55ff00").add_to(m)
 
-    return m._repr_html_()
+@app.cli.command("warm-maps")
+@click.option("--out", "directory", default=None, help="Write the rendered maps to this directory (default: MAP_CACHE_DIR).")
+def warm_maps(directory):
+    """Render the map of every country into the map cache directory."""
+    if MAP_MODE not in MAP_RENDERERS:
+        raise click.ClickException(f"MAP_MODE={MAP_MODE} draws maps in the browser; set MAP_MODE to one of {', '.join(MAP_RENDERERS)}.")
+    # The in-memory cache of this process is gone when the command exits
+    MAP_CACHE.directory = directory or MAP_CACHE.directory
+    if MAP_CACHE.directory is None:
+        raise click.UsageError("Give --out or set MAP_CACHE_DIR.")
+    MAP_CACHE.warm(get_countries().keys())
+    stats = MAP_CACHE.stats()
+    click.echo(f"Rendered {stats['misses']} maps into {MAP_CACHE.directory}, {stats['hits']} were already there")
+
+
+@app.cli.command("simplify-report")
+def simplify_report():
+    """Print the vertex and byte reduction of outline simplification per country."""
+    total_before = total_after = bytes_before = bytes_after = 0
+    click.echo(f"{'iso':<4} {'vertices':>9} {'kept':>9} {'bytes':>10} {'kept':>10} {'saved':>7}")
+    catalog = get_catalog()
+    for country_iso in sorted(catalog):
+        geometry = catalog[country_iso]
+        if geometry.bounds is None:
+            continue
+        simplified = geometry.view_geometry
+        size_before = len(json.dumps(geometry.coords()))
+        size_after = len(json.dumps(simplified.coords()))
+        total_before += geometry.vertex_count
+        total_after += simplified.vertex_count
+        bytes_before += size_before
+        bytes_after += size_after
+        saved = 1 - size_after / size_before
+        click.echo(f"{country_iso:<4} {geometry.vertex_count:>9} {simplified.vertex_count:>9} {size_before:>10} {size_after:>10} {saved:>7.1%}")
+    click.echo(f"{'all':<4} {total_before:>9} {total_after:>9} {bytes_before:>10} {bytes_after:>10} {1 - bytes_after / bytes_before:>7.1%}")
+
+
+@lru_cache(maxsize=None)
+def geometry_bodies(country_iso):
+    """Return (etag, {content encoding: body}) of a country's geometry response"""
+    geometry = get_catalog().get(country_iso)
+    if geometry is None or geometry.bounds is None:
+        return None
+    body = json.dumps(geometry.payload(precision=GEOMETRY_PRECISION), separators=(",", ":")).encode("utf-8")
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    return hashlib.sha256(body).hexdigest()[:32], bodies
+
+
+@app.route("/api/country/<country_iso>/geometry")
+def country_geometry(country_iso):
+    entry = geometry_bodies(country_iso.lower())
+    if entry is None:
+        abort(404)
+    etag, bodies = entry
+
+    encoding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in bodies and candidate in request.accept_encodings:
+            encoding = candidate
+            break
+    # Each encoding is a different representation and needs its own strong ETag
+    if encoding != "identity":
+        etag = f"{etag}-{encoding}"
+
+    response = Response(status=304) if request.if_none_match.contains(etag) else Response(bodies[encoding], mimetype="application/json")
+    if encoding != "identity" and response.status_code == 200:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def flag_sources(country_iso):
+    """Return the src and srcset attributes of a country's flag"""
+    variants = get_flag_variants().get(country_iso)
+    if variants is None:
+        return {"src": f"/static/flags/{country_iso}.png", "webp": "", "png": ""}
+    return {
+        "src": variants["png"][-1][1],
+        "webp": ", ".join(f"{url} {width}w" for width, url in variants["webp"]),
+        "png": ", ".join(f"{url} {width}w" for width, url in variants["png"]),
+    }
+
+
+@app.after_request
+def cache_flag_variants(response):
+    # Variant and atlas file names contain a content hash, so they never change. Errors
+    # are not cached: a file deployed after its manifest must not stay missing for a year
+    if (
+        response.status_code in (200, 304)
+        and request.path.startswith(("/static/flags/variants/", "/static/flags/atlas/"))
+        and not request.path.endswith(".json")
+    ):
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 def init_session():
-    if "remaining_countries" not in session:
-        session["remaining_countries"] = list(COUNTRIES.keys())
+    """Return the countries left in this session, starting a new game if there is none"""
+    country_index = get_country_index()
+    remaining = country_index.decode(session.get("remaining", ""))
+    if remaining is None:
+        remaining = country_index.full()
+        session.pop("remaining_countries", None)
+        session["remaining"] = remaining.encode()
         session["current_country"] = None
+    return remaining
+
+
+def get_scheduler(remaining):
+    """Return a scheduler over the remaining countries, weighted by this session's misses"""
+    return Scheduler(remaining, decode_misses(session.get("misses", ""), remaining.index))
 
 
 @app.route("/")
@@ -96,40 +374,229 @@ def index():
 
 @app.route("/next")
 def next_country():
-    init_session()
-    if not session["remaining_countries"]:
+    remaining = init_session()
+    scheduler = get_scheduler(remaining)
+    previous = session.get("current_country")
+    if session.get("revealed") and previous in remaining:
+        # Moving on without removing the country counts as a miss
+        scheduler.record_miss(previous)
+        session["misses"] = scheduler.encode_misses()
+    session["revealed"] = False
+    if not remaining:
         return "<h1>All countries completed!</h1>"
-    country_iso = random.choice(session["remaining_countries"])
+    country_iso = scheduler.draw(exclude=previous)
     session["current_country"] = country_iso
-    flag_path = f"/static/flags/{country_iso}.png"
-    country_name = COUNTRIES[country_iso]
-    session.modified = True
+    flag = flag_sources(country_iso)
+    country_name = get_countries()[country_iso]
     # Do NOT generate map yet
     map_html = ""
-    return render_template("index.html", flag_path=flag_path, map_html=map_html, country_name=country_name, revealed=False, remaining=len(session["remaining_countries"]))
+    return render_page(flag=flag, map_html=map_html, country_name=country_name, revealed=False, remaining=len(remaining), country_iso=country_iso)
 
 
 @app.route("/reveal")
 def reveal():
-    init_session()
+    remaining = init_session()
     country_iso = session.get("current_country")
     if not country_iso:
         return redirect(url_for("next_country"))
-    map_html = generate_map(country_iso)
-    flag_path = f"/static/flags/{country_iso}.png"
-    country_name = COUNTRIES[country_iso]
-    return render_template("index.html", flag_path=flag_path, map_html=map_html, country_name=country_name, revealed=True, remaining=len(session["remaining_countries"]))
+    session["revealed"] = True
+    map_html = MAP_CACHE.get(country_iso) if MAP_MODE in MAP_RENDERERS else ""
+    flag = flag_sources(country_iso)
+    country_name = get_countries()[country_iso]
+    return render_page(flag=flag, map_html=map_html, country_name=country_name, revealed=True, remaining=len(remaining), country_iso=country_iso)
 
 
 @app.route("/remove")
 def remove():
-    init_session()
+    remaining = init_session()
     country_iso = session.get("current_country")
-    if country_iso and country_iso in session["remaining_countries"]:
-        session["remaining_countries"].remove(country_iso)
-        session.modified = True
+    if country_iso and country_iso in remaining:
+        remaining.discard(country_iso)
+        session["remaining"] = remaining.encode()
     return redirect(url_for("next_country"))
 
 
+# Countries per /api/round batch by default, and the most a client may ask for
+ROUND_SIZE = 20
+MAX_ROUND_SIZE = 50
+
+
+@lru_cache(maxsize=1024)
+def round_countries(batch):
+    """Return the name, flag and geometry URL of each country in `batch`, a tuple of ISO codes"""
+    countries = get_countries()
+    entries = []
+    for country_iso in batch:
+        # Build the geometry responses now so the client's fetches are cache hits
+        has_geometry = geometry_bodies(country_iso) is not None
+        entries.append({
+            "iso": country_iso,
+            "name": countries[country_iso],
+            "flag": flag_sources(country_iso),
+            "geometry": url_for("country_geometry", country_iso=country_iso) if has_geometry else None,
+        })
+    return entries
+
+
+@app.route("/play")
+def play():
+    """Play whole batches of countries in the browser, one request per batch"""
+    init_session()
+    return render_template("round.html")
+
+
+@app.route("/api/round")
+def api_round():
+    remaining = init_session()
+    size = max(1, min(request.args.get("n", ROUND_SIZE, type=int), MAX_ROUND_SIZE))
+    # Until its results are posted, the batch is kept so that a reload gets the same countries
+    batch = tuple(country_iso for country_iso in session.get("batch", ()) if country_iso in remaining)
+    if not batch and remaining:
+        batch = tuple(get_scheduler(remaining).draw_many(size))
+        session["batch"] = list(batch)
+    return {"remaining": len(remaining), "countries": round_countries(batch)}
+
+
+@app.route("/api/round/results", methods=["POST"])
+def api_round_results():
+    """Apply the removals and misses of a batch: {"removed": [...], "missed": [...], "done": true}
+
+    "done": false reports part of a batch (e.g. when the page is closed) and keeps the
+    rest of the batch, without the reported countries so they are not asked and counted again.
+    """
+    remaining = init_session()
+    results = request.get_json(silent=True)
+    if not isinstance(results, dict):
+        abort(400)
+    removed = results.get("removed", [])
+    missed = results.get("missed", [])
+    batch = set(session.get("batch", ()))
+    for codes in (removed, missed):
+        if not isinstance(codes, list) or not all(isinstance(code, str) and code in batch for code in codes):
+            abort(400)
+
+    scheduler = get_scheduler(remaining)
+    for country_iso in missed:
+        scheduler.record_miss(country_iso)
+    for country_iso in removed:
+        scheduler.remove(country_iso)
+    session["remaining"] = remaining.encode()
+    if missed:
+        session["misses"] = scheduler.encode_misses()
+    if results.get("done", True):
+        session.pop("batch", None)
+    else:
+        reported = set(removed) | set(missed)
+        session["batch"] = [country_iso for country_iso in session.get("batch", ()) if country_iso not in reported]
+    return {"remaining": len(remaining)}
+
+
+@app.route("/api/guess")
+def api_guess():
+    """Check a click at ?lat=..&lon=.. against the current country"""
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    if lat is None or lon is None or not -90 <= lat <= 90 or not math.isfinite(lon):
+        abort(400)
+    country_iso = session.get("current_country")
+    if not country_iso:
+        abort(409)
+    index = get_spatial_index()
+    with METRICS.stage("locate"):
+        clicked = index.locate(lat, lon)
+    distance = 0.0 if clicked == country_iso else index.distance_km(lat, lon, country_iso)
+    return {
+        "correct": clicked == country_iso,
+        "clicked": clicked,
+        "clicked_name": get_countries().get(clicked),
+        "distance_km": None if distance is None else round(distance, 1),
+    }
+
+
+# Flags offered per multiple-choice question, and how many of a flag's closest
+# look-alikes the wrong answers are picked from
+CHOICE_OPTIONS = 4
+CHOICE_CANDIDATES = 6
+
+
+def choice_options(country_iso, rng=random):
+    """Return the flags offered for `country_iso`: itself and look-alikes, shuffled"""
+    countries = get_countries()
+    similar = [iso for iso in get_flag_atlas()["similar"].get(country_iso, []) if iso in countries]
+    wrong = rng.sample(similar[:CHOICE_CANDIDATES], min(CHOICE_OPTIONS - 1, len(similar[:CHOICE_CANDIDATES])))
+    # Flags without enough look-alikes in the quiz get random ones
+    while len(wrong) < CHOICE_OPTIONS - 1:
+        candidate = rng.choice(get_country_index().codes)
+        if candidate != country_iso and candidate not in wrong:
+            wrong.append(candidate)
+    options = [country_iso] + wrong
+    rng.shuffle(options)
+    return options
+
+
+@app.route("/choice")
+def choice():
+    """Multiple choice: pick the flag of the named country among look-alikes"""
+    if get_flag_atlas() is None:
+        abort(404, "Run build_flag_atlas.py first")
+    init_session()
+    return render_template("choice.html", atlas=get_flag_atlas())
+
+
+@app.route("/api/choice")
+def api_choice():
+    remaining = init_session()
+    atlas = get_flag_atlas()
+    if atlas is None:
+        abort(404)
+    if not remaining:
+        return {"remaining": 0, "name": None, "options": []}
+    country_iso = get_scheduler(remaining).draw(exclude=session.get("current_country"))
+    session["current_country"] = country_iso
+    session["revealed"] = False
+    session["answered"] = False
+    flags = atlas["flags"]
+    return {
+        "remaining": len(remaining),
+        "name": get_countries()[country_iso],
+        "options": [{"iso": iso, "rect": flags[iso]} for iso in choice_options(country_iso) if iso in flags],
+    }
+
+
+@app.route("/api/choice", methods=["POST"])
+def api_choice_answer():
+    """Check the picked flag, {"iso": ...}: a right answer removes the country, a wrong one counts as a miss"""
+    remaining = init_session()
+    answer = request.get_json(silent=True)
+    country_iso = session.get("current_country")
+    if not isinstance(answer, dict) or not country_iso:
+        abort(400)
+    correct = answer.get("iso") == country_iso
+    # Only the first answer to a question counts. Not "revealed": /next would
+    # record a second miss for a wrong answer
+    if country_iso in remaining and not session.get("answered"):
+        session["answered"] = True
+        scheduler = get_scheduler(remaining)
+        if correct:
+            scheduler.remove(country_iso)
+            session["remaining"] = remaining.encode()
+        else:
+            scheduler.record_miss(country_iso)
+            session["misses"] = scheduler.encode_misses()
+    return {"correct": correct, "answer": country_iso, "remaining": len(remaining)}
+
+
+@app.route("/resume/<session_id>")
+def resume(session_id):
+    """Continue a game stored on the server, e.g. from another device"""
+    response = redirect(url_for("next_country"))
+    interface = app.session_interface
+    if isinstance(interface, ServerSessionInterface):
+        data = interface.store.load(session_id)
+        if data is not None:
+            interface.set_session_cookie(app, ServerSession(session_id, data), response)
+    return response
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
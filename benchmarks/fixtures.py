@@ -0,0 +1,103 @@
+"""Synthetic country outlines for running the app and benchmarks offline.
+
+The real countries.geojson is not part of the repository. This writes a
+GeoJSON file with one feature per country in countries.json, placed at the
+country's centroid from countries_centroids.geojson, with realistic vertex
+counts: a few countries with long coastlines and many islands, most with a
+few hundred to a few thousand vertices.
+
+    python benchmarks/fixtures.py /tmp/countries.geojson
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COUNTRIES_JSON = os.path.join(BASE_DIR, "country-flags-main", "countries.json")
+CENTROIDS_FILE = os.path.join(BASE_DIR, "country_outlines", "countries_centroids.geojson")
+
+# Countries with very detailed outlines in the real data: (vertices, islands)
+DETAILED = {
+    "CA": (60000, 400),
+    "RU": (45000, 150),
+    "US": (30000, 120),
+    "NO": (25000, 300),
+    "ID": (25000, 500),
+    "GL": (20000, 150),
+    "CL": (15000, 200),
+    "AU": (12000, 80),
+    "PH": (10000, 300),
+    "GB": (10000, 100),
+    "JP": (9000, 150),
+    "NZ": (8000, 60),
+    "FJ": (3000, 100),
+    "KI": (1500, 30),
+}
+
+
+def outline(rng, lon, lat, radius, vertices):
+    """Return a closed, irregular ring of `vertices` points around (lon, lat)"""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    # Sum of random harmonics gives a coastline-like, non-self-intersecting radius
+    harmonics = np.arange(1, 40)
+    amplitudes = rng.normal(0, 0.25, len(harmonics)) / harmonics
+    phases = rng.uniform(0, 2 * np.pi, len(harmonics))
+    noise = (amplitudes[:, None] * np.sin(harmonics[:, None] * angles + phases[:, None])).sum(axis=0)
+    noise += rng.normal(0, 0.01, vertices)
+    radii = radius * np.clip(1 + noise, 0.3, None)
+    ring = np.column_stack((lon + radii * np.cos(angles) / max(np.cos(np.radians(lat)), 0.2), np.clip(lat + radii * np.sin(angles), -89.9, 89.9)))
+    return np.vstack((ring, ring[:1])).round(6).tolist()
+
+
+def make_feature(rng, iso, name, lon, lat):
+    vertices, islands = DETAILED.get(iso, (int(np.clip(rng.lognormal(6.8, 0.8), 60, 8000)), int(rng.poisson(2))))
+    radius = np.sqrt(vertices) / 40
+    island_vertices = vertices // 4 // max(islands, 1)
+    polygons = [[outline(rng, lon, lat, radius, vertices - island_vertices * islands)]]
+    for _ in range(islands):
+        angle = rng.uniform(0, 2 * np.pi)
+        distance = radius * rng.uniform(1.3, 3)
+        polygons.append([outline(rng, lon + distance * np.cos(angle), lat + distance * np.sin(angle), radius * rng.uniform(0.01, 0.1), max(island_vertices, 8))])
+    if iso in ("RU", "FJ", "NZ", "KI", "US"):
+        # Pieces on the far side of the antimeridian, as in the real data
+        polygons.append([outline(rng, -179.5, lat, 0.4, 200)])
+    geometry = {"type": "MultiPolygon", "coordinates": polygons} if len(polygons) > 1 else {"type": "Polygon", "coordinates": polygons[0]}
+    return {"type": "Feature", "properties": {"name": name, "ISO3166-1-Alpha-2": iso}, "geometry": geometry}
+
+
+def write_fixture(path, seed=0):
+    """Write the synthetic GeoJSON to `path` and return the number of vertices"""
+    rng = np.random.default_rng(seed)
+    with open(COUNTRIES_JSON, "r", encoding="utf-8") as f:
+        names = json.load(f)
+    with open(CENTROIDS_FILE, "r", encoding="utf-8") as f:
+        centroids = {feature["properties"]["ISO"]: feature["geometry"]["coordinates"] for feature in json.load(f)["features"]}
+
+    features = []
+    for iso, name in sorted(names.items()):
+        lon, lat = centroids.get(iso, (rng.uniform(-170, 170), rng.uniform(-60, 70)))
+        features.append(make_feature(rng, iso, name, lon, lat))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+    def count(geometry):
+        coords = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        return sum(len(ring) for polygon in coords for ring in polygon)
+
+    return sum(count(feature["geometry"]) for feature in features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    vertices = write_fixture(args.output, args.seed)
+    print(f"Wrote {args.output} with {vertices} vertices ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Load test of gunicorn with sync workers against threaded workers with a render pool.
+
+Starts the app under gunicorn twice on the synthetic outlines from
+benchmarks/fixtures.py, in folium map mode with the map cache turned off so
+every /reveal renders a map, and has concurrent clients play the game:
+
+    python benchmarks/load_test.py --clients 16 --duration 15
+
+The "sync" run uses plain sync workers. The "pool" run serves requests from
+GUNICORN_THREADS threads per worker and renders maps in a RENDER_WORKERS
+process pool (see app.py), so /next does not wait behind /reveal. Latency
+percentiles are printed per route. Refused requests (503) are counted and
+retried after their Retry-After delay until they succeed; the latency of such
+a request covers every attempt and wait.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from fixtures import write_fixture  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, env, workers):
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "-b", f"127.0.0.1:{port}", "app:app"]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/next", timeout=5).read()
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def play(base_url, stop, recording, reveal_share, latencies, rejected, seed):
+    """One player: load /next, and for a share of the countries also /reveal"""
+    rng = random.Random(seed)
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    while not stop.is_set():
+        routes = ["/next", "/reveal"] if rng.random() < reveal_share else ["/next"]
+        for route in routes:
+            # A refused request is retried until it succeeds, like a player would, and
+            # its latency covers all the attempts and waits
+            start = time.perf_counter()
+            while True:
+                try:
+                    opener.open(base_url + route, timeout=60).read()
+                    break
+                except urllib.error.HTTPError as error:
+                    if error.code != 503:
+                        raise
+                    if recording.is_set():
+                        rejected[route] = rejected.get(route, 0) + 1
+                    time.sleep(float(error.headers.get("Retry-After", 1)))
+            if recording.is_set():
+                latencies.setdefault(route, []).append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(env, args):
+    port = free_port()
+    server = start_server(port, env, args.workers)
+    latencies, rejected = {}, {}
+    stop = threading.Event()
+    recording = threading.Event()
+    try:
+        clients = [
+            threading.Thread(target=play, args=(f"http://127.0.0.1:{port}", stop, recording, args.reveal_share, latencies, rejected, seed))
+            for seed in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        time.sleep(args.warmup)
+        recording.set()
+        time.sleep(args.duration)
+        stop.set()
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {}
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        results[route] = {
+            "requests": len(values),
+            "per_second": len(values) / args.duration,
+            "p50_ms": percentile(values, 0.5),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "rejected": rejected.get(route, 0),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent players")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per run")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load before recording")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker in the pool run")
+    parser.add_argument("--render-workers", type=int, default=2, help="map render processes per worker in the pool run")
+    parser.add_argument("--reveal-share", type=float, default=0.2, help="share of countries that are revealed")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        geojson = os.path.join(tmp, "countries.geojson")
+        write_fixture(geojson)
+        base_env = dict(os.environ, GEOJSON_FILE=geojson, MAP_MODE="folium", MAP_CACHE_SIZE="0", LOG_LEVEL="WARNING", METRICS="0")
+        base_env.pop("MAP_CACHE_DIR", None)
+        runs = {
+            "sync": dict(base_env, GUNICORN_THREADS="1", RENDER_WORKERS="0"),
+            "pool": dict(base_env, GUNICORN_THREADS=str(args.threads), RENDER_WORKERS=str(args.render_workers)),
+        }
+        report = {name: run(env, args) for name, env in runs.items()}
+
+    print(f"{'run':<6} {'route':<8} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'503s':>6}")
+    for name, results in report.items():
+        for route, result in results.items():
+            print(
+                f"{name:<6} {route:<8} {result['requests']:>9} {result['per_second']:>8.1f} {result['p50_ms']:>9.1f} "
+                f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['rejected']:>6}"
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Offline benchmarks for map generation and the Flask routes.
+
+Generates the synthetic outlines from benchmarks/fixtures.py (or uses
+--geojson), times the geometry lookup, folium map generation and the /next,
+/reveal and /remove routes through Flask's test client, records the peak
+memory of each benchmark and writes the results as JSON:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from fixtures import write_fixture  # noqa: E402
+
+# A result is reported as a regression when its median is this much slower than
+# the baseline, and by more than REGRESSION_MIN_MS so timer noise is ignored
+REGRESSION_THRESHOLD = 1.25
+REGRESSION_MIN_MS = 0.1
+
+
+def measure(fn, runs, setup=None):
+    """Time `fn` over `runs` calls, then run it once more under tracemalloc for its peak memory"""
+    if setup is not None:
+        setup()
+    fn()
+    times = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "runs": runs,
+        "mean_ms": statistics.fmean(times),
+        "p50_ms": times[len(times) // 2],
+        "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "min_ms": times[0],
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_benchmarks(runs):
+    import app as flag_app
+
+    results = {}
+    start = time.perf_counter()
+    flag_app.preload()
+    results["startup"] = {"runs": 1, "mean_ms": (time.perf_counter() - start) * 1000}
+
+    countries = sorted(flag_app.get_countries())
+    large = [iso for iso in ("ca", "ru", "us", "no", "id") if iso in flag_app.get_catalog()]
+    cycle = iter(range(sys.maxsize))
+
+    def next_iso():
+        return countries[next(cycle) % len(countries)]
+
+    results["get_country_coords"] = measure(lambda: flag_app.get_country_coords(next_iso()), runs)
+    results["get_country_coords_large"] = measure(lambda: [flag_app.get_country_coords(iso) for iso in large], max(runs // 10, 3))
+    results["generate_map"] = measure(lambda: flag_app.generate_map(next_iso()), max(runs // 10, 3))
+    results["generate_map_large"] = measure(lambda: [flag_app.generate_map(iso) for iso in large], 3)
+    client = flag_app.app.test_client()
+    results["geometry_api_cold"] = measure(lambda: client.get(f"/api/country/{next_iso()}/geometry"), runs, setup=flag_app.geometry_bodies.cache_clear)
+    results["geometry_api_cached"] = measure(lambda: client.get("/api/country/de/geometry", headers={"Accept-Encoding": "gzip"}), runs)
+    results["route_next"] = measure(lambda: client.get("/next"), runs)
+    results["route_reveal"] = measure(lambda: client.get("/reveal"), runs, setup=lambda: client.get("/next"))
+    flag_app.MAP_MODE = "folium"
+    results["route_reveal_folium_cold"] = measure(lambda: client.get("/reveal"), max(runs // 10, 3), setup=lambda: (client.get("/next"), flag_app.MAP_CACHE.clear()))
+    results["route_reveal_folium_cached"] = measure(lambda: client.get("/reveal"), runs)
+    flag_app.MAP_MODE = "leaflet"
+    results["route_remove"] = measure(lambda: client.get("/remove"), runs, setup=lambda: client.get("/next"))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the change against a previous results file; return the names of regressed benchmarks"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        old, new = before.get("p50_ms", before["mean_ms"]), result.get("p50_ms", result["mean_ms"])
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio > REGRESSION_THRESHOLD and new - old > REGRESSION_MIN_MS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {old:>10.3f} -> {new:>10.3f} ms (p50)  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--geojson", help="outlines to use instead of the synthetic fixture")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        geojson = args.geojson
+        if geojson is None:
+            geojson = os.path.join(tmp, "countries.geojson")
+            write_fixture(geojson)
+        os.environ["GEOJSON_FILE"] = geojson
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        results = run_benchmarks(args.runs)
+
+    print(f"{'benchmark':<28} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'peak KB':>10}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['mean_ms']:>10.3f} {result.get('p50_ms', result['mean_ms']):>10.3f} {result.get('p95_ms', result['mean_ms']):>10.3f} {result.get('peak_kb', 0):>10.0f}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixture": "synthetic" if args.geojson is None else args.geojson,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
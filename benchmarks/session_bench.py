@@ -0,0 +1,58 @@
+"""Compare the cookie session with the server-side session stores.
+
+Plays the same /next + /remove loop through Flask's test client with each
+backend and reports time per request and the size of the session cookie.
+
+    python benchmarks/session_bench.py --rounds 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.sessions import SecureCookieSessionInterface
+
+import app as flag_app
+from session_store import MemoryStore, ServerSessionInterface, SQLiteStore
+
+
+def run(interface, rounds):
+    flag_app.app.session_interface = interface
+    cookie_sizes = []
+    start = time.perf_counter()
+    for i in range(rounds):
+        if i % len(flag_app.get_countries()) == 0:
+            # A new player once every country has been removed
+            client = flag_app.app.test_client()
+        for path in ("/next", "/remove"):
+            response = client.get(path)
+            cookie = response.headers.get("Set-Cookie")
+            if cookie:
+                cookie_sizes.append(len(cookie.split(";")[0]))
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * 2) * 1e6, max(cookie_sizes, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "cookie": SecureCookieSessionInterface(),
+            "memory": ServerSessionInterface(MemoryStore()),
+            "sqlite": ServerSessionInterface(SQLiteStore(os.path.join(tmp, "sessions.sqlite3"))),
+        }
+        print(f"{'backend':<8} {'us/request':>11} {'cookie bytes':>13}")
+        for name, interface in backends.items():
+            per_request, cookie_size = run(interface, args.rounds)
+            print(f"{name:<8} {per_request:>11.1f} {cookie_size:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Build the flag thumbnail atlas and look-alike table for the multiple-choice mode.
+
+Run once before deploying, like build_flags.py:
+
+    python build_flag_atlas.py
+
+Every flag is reduced to a small feature vector (the mean colour of each cell
+of a coarse grid plus a colour histogram), the nearest neighbours of each
+flag are found with one vectorized distance matrix, and thumbnails of all
+flags are packed into a single sprite image. The sprite and an atlas.json
+with the thumbnail offsets and the look-alike table are written to
+static/flags/atlas.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+FLAGS_FOLDER = os.path.join(BASE_DIR, "country-flags-main", "png")
+ATLAS_FOLDER = os.path.join(BASE_DIR, "static", "flags", "atlas")
+ATLAS_URL = "/static/flags/atlas"
+
+# Thumbnails are fitted into cells of this size, keeping their aspect ratio
+CELL_WIDTH = 120
+CELL_HEIGHT = 80
+# Flags are compared on a GRID_WIDTH x GRID_HEIGHT grid of mean colours, so
+# flags with different aspect ratios (Indonesia and Monaco) still line up
+GRID_WIDTH = 12
+GRID_HEIGHT = 8
+# Colour histogram bins per channel
+HISTOGRAM_BINS = 4
+# Weight of the histogram against the layout grid
+HISTOGRAM_WEIGHT = 0.5
+# Look-alikes stored per flag
+NEIGHBOURS = 10
+
+
+def flag_features(file_name):
+    """Return the ISO code, feature vector and thumbnail of one flag"""
+    country_iso = os.path.splitext(file_name)[0]
+    with Image.open(os.path.join(FLAGS_FOLDER, file_name)) as source:
+        source = source.convert("RGB")
+    grid = np.asarray(source.resize((GRID_WIDTH, GRID_HEIGHT), Image.Resampling.BOX), dtype=np.float32) / 255
+
+    pixels = np.asarray(source.resize((64, 64), Image.Resampling.BOX)).reshape(-1, 3) // (256 // HISTOGRAM_BINS)
+    bins = (pixels[:, 0] * HISTOGRAM_BINS + pixels[:, 1]) * HISTOGRAM_BINS + pixels[:, 2]
+    histogram = np.bincount(bins, minlength=HISTOGRAM_BINS**3).astype(np.float32) / len(bins)
+
+    features = np.concatenate([grid.ravel() / math.sqrt(GRID_WIDTH * GRID_HEIGHT), np.sqrt(histogram) * HISTOGRAM_WEIGHT])
+
+    thumbnail = source.copy()
+    thumbnail.thumbnail((CELL_WIDTH, CELL_HEIGHT), Image.Resampling.LANCZOS)
+    return country_iso, features, thumbnail
+
+
+def nearest_neighbours(features, count):
+    """Return the indices of the `count` nearest rows of `features` for every row, nearest first"""
+    squared = np.einsum("ij,ij->i", features, features)
+    distances = squared[:, None] + squared[None, :] - 2 * features @ features.T
+    np.fill_diagonal(distances, np.inf)
+    count = min(count, len(features) - 1)
+    nearest = np.argpartition(distances, count, axis=1)[:, :count]
+    order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def pack_atlas(thumbnails):
+    """Paste the thumbnails into one image; return it and each thumbnail's [x, y, width, height]"""
+    columns = math.ceil(math.sqrt(len(thumbnails)))
+    rows = math.ceil(len(thumbnails) / columns)
+    atlas = Image.new("RGB", (columns * CELL_WIDTH, rows * CELL_HEIGHT), "white")
+    rects = []
+    for i, thumbnail in enumerate(thumbnails):
+        x = i % columns * CELL_WIDTH
+        y = i // columns * CELL_HEIGHT
+        atlas.paste(thumbnail, (x, y))
+        rects.append([x, y, thumbnail.width, thumbnail.height])
+    return atlas, rects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    file_names = sorted(name for name in os.listdir(FLAGS_FOLDER) if name.endswith(".png"))
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        country_isos, features, thumbnails = zip(*pool.map(flag_features, file_names))
+
+    neighbours = nearest_neighbours(np.stack(features), NEIGHBOURS)
+    atlas, rects = pack_atlas(thumbnails)
+
+    buffer = io.BytesIO()
+    atlas.save(buffer, format="WEBP", quality=85, method=6)
+    data = buffer.getvalue()
+    name = f"atlas.{hashlib.sha256(data).hexdigest()[:12]}.webp"
+    os.makedirs(ATLAS_FOLDER, exist_ok=True)
+    with open(os.path.join(ATLAS_FOLDER, name), "wb") as f:
+        f.write(data)
+
+    manifest = {
+        "image": f"{ATLAS_URL}/{name}",
+        "width": atlas.width,
+        "height": atlas.height,
+        "flags": dict(zip(country_isos, rects)),
+        "similar": {country_iso: [country_isos[j] for j in row] for country_iso, row in zip(country_isos, neighbours)},
+    }
+    with open(os.path.join(ATLAS_FOLDER, "atlas.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f"Packed {len(country_isos)} flags into {name} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Build resized WebP and PNG variants of every flag with content-hashed file names.
+
+Run once before deploying:
+
+    python build_flags.py
+
+The variants and a manifest.json describing them are written to
+static/flags/variants. The Flask app picks the manifest up at start-up and
+serves the variants through srcset with immutable cache headers.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+FLAGS_FOLDER = os.path.join(BASE_DIR, "country-flags-main", "png")
+VARIANTS_FOLDER = os.path.join(BASE_DIR, "static", "flags", "variants")
+VARIANTS_URL = "/static/flags/variants"
+WIDTHS = (160, 320, 640, 1280)
+FORMATS = {"webp": {"quality": 85, "method": 6}, "png": {"optimize": True}}
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **FORMATS[fmt])
+    return buffer.getvalue()
+
+
+def build_flag(file_name):
+    """Write all variants of one flag and return its manifest entry"""
+    country_iso = os.path.splitext(file_name)[0]
+    with Image.open(os.path.join(FLAGS_FOLDER, file_name)) as source:
+        source = source.convert("RGBA")
+    widths = [width for width in WIDTHS if width < source.width] + [min(source.width, WIDTHS[-1])]
+
+    entry = {fmt: [] for fmt in FORMATS}
+    for width in widths:
+        height = round(source.height * width / source.width)
+        image = source.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            data = encode(image, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            name = f"{country_iso}-{width}.{digest}.{fmt}"
+            path = os.path.join(VARIANTS_FOLDER, name)
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(data)
+            entry[fmt].append([width, f"{VARIANTS_URL}/{name}"])
+    entry["width"] = source.width
+    entry["height"] = source.height
+    return country_iso, entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    os.makedirs(VARIANTS_FOLDER, exist_ok=True)
+    file_names = sorted(name for name in os.listdir(FLAGS_FOLDER) if name.endswith(".png"))
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        manifest = dict(pool.map(build_flag, file_names))
+
+    with open(os.path.join(VARIANTS_FOLDER, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f"Built variants for {len(manifest)} flags in {VARIANTS_FOLDER}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,22 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import geopandas as gpd
-import matplotlib.pyplot as plt
+import matplotlib
+
+matplotlib.use("Agg")
 import numpy as np
 
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+GEOJSON_FILE = os.path.join(BASE_DIR, "countries.geojson")
+VIEWPORTS_FILE = os.path.join(BASE_DIR, "viewports.json")
+OUTPUT_DIR = os.path.join(BASE_DIR, "imgs")
+
+color_dark = np.array([240, 141, 0]) / 255.0
+color_bright = np.array([255, 225, 150]) / 255.0
+
 
 def scale_square(mp, xmin, ymin, xmax, ymax, factor):
     return (
@@ -42,111 +57,97 @@ def get_minimal_square(xmin, ymin, xmax, ymax, world_bounds):
     return scaled_square
 
 
-def get_russia_bounds(xmin, ymin, xmax, ymax):
-    xmax *= 2.75
-    xmin *= -0.1
+def apply_viewport(xmin, ymin, xmax, ymax, viewport):
+    """Scale a bounding square by the per-country factors from viewports.json"""
+    xmin *= viewport.get("xmin", 1)
+    xmax *= viewport.get("xmax", 1)
+    ymax *= viewport.get("ymax", 1)
     ymin = ymax - (xmax - xmin)
     return xmin, ymin, xmax, ymax
 
 
-def get_france_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.15
-    xmax *= 0.2
-    ymax *= 0.48
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
+def load_world():
+    """Read the outlines once and project them to Web Mercator"""
+    df = gpd.read_file(GEOJSON_FILE)
+    df.to_crs("EPSG:3857", inplace=True)
+    return df
 
 
-def get_norway_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.3
-    xmax *= 0.45
-    ymax *= 0.77
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
+def load_viewports():
+    with open(VIEWPORTS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def get_netherlands_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.1
-    xmax *= 0.3
-    ymax *= 0.5
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
+def output_path(df, i):
+    iso = df["ISO3166-1-Alpha-2"][i].lower()
+    return os.path.join(OUTPUT_DIR, f"{iso}_{df['name'][i]}_{i}.png")
 
 
-def get_liechtenstein_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.6
-    xmax *= 1.3
-    ymax *= 1.05
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
+def is_up_to_date(path, sources):
+    if not os.path.exists(path):
+        return False
+    return os.path.getmtime(path) >= max(os.path.getmtime(source) for source in sources)
 
 
-def get_rwanda_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.6
-    xmax *= 1.3
-    ymax *= 4
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
-
+# Per-process state, set up once by init_worker
+_world = None
+_viewports = None
+_ax = None
 
-def get_portugal_bounds(xmin, ymin, xmax, ymax):
-    xmin *= 0.4
-    xmax *= 0.4
-    ymax *= 0.65
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
-
-
-def get_fiji_bounds(xmin, ymin, xmax, ymax):
-    xmax *= 1.13
-    xmin *= -0.99
-    ymax *= -0.05
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
 
+def init_worker(world, viewports):
+    """Plot the whole world once; each country is then drawn on top of it"""
+    global _world, _viewports, _ax
+    _world = world
+    _viewports = viewports
+    _ax = world.plot(color=color_bright)
+    _ax.set_axis_off()
 
-def get_newzealand_bounds(xmin, ymin, xmax, ymax):
-    xmax *= 1.2
-    xmin *= -0.85
-    ymax *= -0.1
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
 
+def render_country(i):
+    ctry = _world.loc[[i], "geometry"]
+    highlight = _world.loc[[i]].plot(ax=_ax, color=color_dark).collections[-1]
 
-def get_seychell_bounds(xmin, ymin, xmax, ymax):
-    xmax *= 0.74
-    xmin *= 2.09
-    ymax *= -0.18
-    ymin = ymax - (xmax - xmin)
-    return xmin, ymin, xmax, ymax
+    xmin, ymin, xmax, ymax = get_minimal_square(*ctry.total_bounds, _world.total_bounds)
+    viewport = _viewports.get(_world["ISO3166-1-Alpha-2"][i].lower())
+    if viewport is not None:
+        xmin, ymin, xmax, ymax = apply_viewport(xmin, ymin, xmax, ymax, viewport)
+    _ax.set_xlim(xmin, xmax)
+    _ax.set_ylim(ymin, ymax)
 
+    path = output_path(_world, i)
+    _ax.figure.savefig(path, dpi=300, bbox_inches="tight", pad_inches=0)
+    highlight.remove()
+    return path
 
-path = "country_outlines/countries.geojson"
 
-df = gpd.read_file(path)
-df.to_crs("EPSG:3857", inplace=True)
-world_bounds = df.total_bounds
-color_dark = np.array([240, 141, 0]) / 255.0
-color_bright = np.array([255, 225, 150]) / 255.0
+def main():
+    parser = argparse.ArgumentParser(description="Render an outline image for every country.")
+    parser.add_argument("iso", nargs="*", help="only render these ISO3166-1-Alpha-2 codes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="re-render images that are up to date")
+    args = parser.parse_args()
 
-id = 47
-for i in range(id, id + 1):
-    # for i in range(df.shape[0]):
-    ctry_names = df["name"]
-    ctry_ids = df["ISO3166-1-Alpha-2"]
+    world = load_world()
+    viewports = load_viewports()
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    df["color"] = [color_dark if country == ctry_names[i] else color_bright for country in ctry_names]
-    ax = df.plot(color=df["color"])
+    only = {iso.lower() for iso in args.iso}
+    sources = [GEOJSON_FILE, VIEWPORTS_FILE, os.path.abspath(__file__)]
+    todo = []
+    for i in world.index:
+        if only and world["ISO3166-1-Alpha-2"][i].lower() not in only:
+            continue
+        if not args.force and is_up_to_date(output_path(world, i), sources):
+            continue
+        todo.append(i)
+    print(f"Rendering {len(todo)} of {len(world)} countries with {args.workers} workers")
 
-    ctry = df.loc[[i], "geometry"]
-    xmin, ymin, xmax, ymax = get_minimal_square(*ctry.total_bounds, world_bounds)
-    # xmin, ymin, xmax, ymax = ctry.total_bounds
-    xmin, ymin, xmax, ymax = get_russia_bounds(xmin, ymin, xmax, ymax)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(world, viewports)) as pool:
+        futures = [pool.submit(render_country, i) for i in todo]
+        for future in as_completed(futures):
+            print(future.result())
 
-    ax.set_xlim(xmin, xmax)
-    ax.set_ylim(ymin, ymax)
 
-    # plt.show()
-    ax.set_axis_off()
-    plt.savefig(f"country_outlines/imgs/{ctry_ids[i].lower()}_{ctry_names[i]}_{i}.png", dpi=300, bbox_inches="tight", pad_inches=0)
-    plt.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Export the whole game as static files that any web server or CDN can serve.
+
+    python export_static.py --out dist
+
+Writes index.html (the batched /play page with its state in localStorage),
+data/countries.json with the name, flag and outline URL of every country, one
+outline per country under geometry/ with pre-compressed .gz (and .br) copies
+for nginx's gzip_static, and a copy of static/ with the flag variants from
+build_flags.py. Serve the output directory as the site root; no Python runs
+per request.
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import app as flag_app
+
+GEOMETRY_URL = "/geometry"
+COUNTRIES_URL = "/data/countries.json"
+# Compressed copies a web server can send as is, by file suffix
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def export_geometry(country_iso, out_dir):
+    """Write a country's outline and its compressed copies; return whether it has one"""
+    entry = flag_app.geometry_bodies(country_iso)
+    if entry is None:
+        return False
+    _, bodies = entry
+    path = os.path.join(out_dir, "geometry", f"{country_iso}.json")
+    for encoding, body in bodies.items():
+        with open(path + ENCODING_SUFFIXES.get(encoding, ""), "wb") as f:
+            f.write(body)
+    return True
+
+
+def export(out_dir, workers):
+    countries = flag_app.get_countries()
+    country_isos = sorted(countries)
+    # Load the outlines before forking so the workers share them
+    flag_app.preload()
+
+    os.makedirs(os.path.join(out_dir, "geometry"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "data"), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        has_geometry = dict(zip(country_isos, pool.map(export_geometry, country_isos, [out_dir] * len(country_isos))))
+
+    entries = [
+        {
+            "iso": country_iso,
+            "name": countries[country_iso],
+            "flag": flag_app.flag_sources(country_iso),
+            "geometry": f"{GEOMETRY_URL}/{country_iso}.json" if has_geometry[country_iso] else None,
+        }
+        for country_iso in country_isos
+    ]
+    with open(os.path.join(out_dir, COUNTRIES_URL.lstrip("/")), "w", encoding="utf-8") as f:
+        json.dump(entries, f, separators=(",", ":"))
+
+    with flag_app.app.test_request_context("/"):
+        page = flag_app.render_template("static_round.html", countries_url=COUNTRIES_URL, round_size=flag_app.ROUND_SIZE)
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+
+    shutil.copytree(flag_app.app.static_folder, os.path.join(out_dir, "static"), dirs_exist_ok=True)
+    return sum(has_geometry.values()), len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="dist", help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    outlines, total = export(args.out, args.workers)
+    print(f"Exported {total} countries ({outlines} with outlines) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
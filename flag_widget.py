@@ -1,15 +1,42 @@
+from collections import OrderedDict
 from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QSizePolicy
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QPixmap, QImage
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+# Number of scaled pixmaps kept per widget, keyed by (path, width, height)
+SCALED_CACHE_SIZE = 32
+# Delay after the last resize event before the high-quality rescale
+RESIZE_DEBOUNCE_MS = 120
+
+
+class ImageLoaderSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+
+
+class ImageLoader(QRunnable):
+    """Decode an image file on a worker thread"""
+
+    def __init__(self, path: str, signals: ImageLoaderSignals):
+        super().__init__()
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        self.signals.loaded.emit(self.path, QImage(self.path))
 
 
 class FlagWidget(QWidget):
     def __init__(self, flag_path: str, ctry_name: str, parent=None):
         super().__init__(parent)
-        self.flag_path = flag_path
+        self.flag_path = None
         self.ctry_name = ctry_name
-
-        self.pixmap_original = QPixmap(self.flag_path)
+        self.pixmap_original = QPixmap()
+        # Path pixmap_original was decoded from; lags behind flag_path while a load is pending
+        self.pixmap_path = None
+        self.scaled_cache = OrderedDict()
+        # Owned by the widget so it outlives loaders that finish after another flag was selected
+        self.loader_signals = ImageLoaderSignals(self)
+        self.loader_signals.loaded.connect(self.on_image_loaded)
 
         self.img_container = QLabel(self)
         self.img_container.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -19,22 +46,42 @@ class FlagWidget(QWidget):
         self.layout.addWidget(self.img_container)
         self.setLayout(self.layout)
 
-        self.update_pixmap()
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_DEBOUNCE_MS)
+        self.resize_timer.timeout.connect(self.update_pixmap)
+
+        self.set_flag_path(flag_path, ctry_name)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.update_pixmap()
+        # Cheap rescale while the user is dragging, one smooth rescale once they stop
+        self.update_pixmap(Qt.TransformationMode.FastTransformation)
+        self.resize_timer.start()
 
     def set_flag_path(self, flag_path: str, ctry_name: str):
-        """Update the image path and reload the pixmap."""
+        """Update the image path and decode the new image in the background."""
         if flag_path == self.flag_path:
             return
         self.flag_path = flag_path
         self.ctry_name = ctry_name
-        self.pixmap_original = QPixmap(self.flag_path)
+        QThreadPool.globalInstance().start(ImageLoader(flag_path, self.loader_signals))
+
+    def set_flag_image(self, flag_path: str, ctry_name: str, image: QImage):
+        """Show an image that was already decoded, e.g. by a prefetch."""
+        self.flag_path = flag_path
+        self.ctry_name = ctry_name
+        self.on_image_loaded(flag_path, image)
+
+    def on_image_loaded(self, flag_path: str, image: QImage):
+        # Ignore images that finished decoding after another flag was selected
+        if flag_path != self.flag_path:
+            return
+        self.pixmap_original = QPixmap.fromImage(image)
+        self.pixmap_path = flag_path
         self.update_pixmap()
 
-    def update_pixmap(self):
+    def update_pixmap(self, mode=Qt.TransformationMode.SmoothTransformation):
         if self.pixmap_original.isNull():
             self.img_container.clear()
             return
@@ -43,9 +90,23 @@ class FlagWidget(QWidget):
         if available.width() <= 0 or available.height() <= 0:
             return
 
+        if mode == Qt.TransformationMode.FastTransformation:
+            scaled = self.pixmap_original.scaled(available, Qt.AspectRatioMode.KeepAspectRatio, mode)
+        else:
+            scaled = self.get_scaled_pixmap(available)
+        self.img_container.setPixmap(scaled)
+
+    def get_scaled_pixmap(self, size):
+        key = (self.pixmap_path, size.width(), size.height())
+        if key in self.scaled_cache:
+            self.scaled_cache.move_to_end(key)
+            return self.scaled_cache[key]
         scaled = self.pixmap_original.scaled(
-            available,
+            size,
             Qt.AspectRatioMode.KeepAspectRatio,
             Qt.TransformationMode.SmoothTransformation,
         )
-        self.img_container.setPixmap(scaled)
+        self.scaled_cache[key] = scaled
+        while len(self.scaled_cache) > SCALED_CACHE_SIZE:
+            self.scaled_cache.popitem(last=False)
+        return scaled
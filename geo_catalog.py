@@ -0,0 +1,334 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+from functools import cached_property, lru_cache
+
+import numpy as np
+
+# Countries whose outlines straddle the antimeridian are wrapped into one
+# continuous longitude range: (lon - 340) % 360 + offset
+ANTIMERIDIAN_SHIFTS = {
+    "ru": -20,
+    "nz": -20,
+    "fj": -20,
+    "ki": -20,
+    "us": -380,
+}
+
+# Approximate width in pixels of the map that fit_bounds fills; vertices closer
+# together than half a pixel at that scale are not visible
+MAP_PIXELS = 1024
+
+
+def wrap_longitudes(lons, offset):
+    """Return wrapped copies of the longitudes in `lons`"""
+    return np.mod(lons - 340, 360) + offset
+
+
+def pack_coords(coords):
+    """Flatten MultiPolygon coordinates into (points, ring_offsets, polygon_offsets)
+
+    `points` is a contiguous (n, 2) float array of lon/lat pairs, ring `i` spans
+    points[ring_offsets[i]:ring_offsets[i + 1]] and polygon `j` spans rings
+    polygon_offsets[j] to polygon_offsets[j + 1].
+    """
+    rings = [ring for polygon in coords for ring in polygon]
+    ring_sizes = [len(ring) for ring in rings]
+    ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(ring_sizes, out=ring_offsets[1:])
+    polygon_offsets = np.zeros(len(coords) + 1, dtype=np.int64)
+    np.cumsum([len(polygon) for polygon in coords], out=polygon_offsets[1:])
+    points = np.array([point[:2] for ring in rings for point in ring], dtype=np.float64).reshape(-1, 2)
+    return points, ring_offsets, polygon_offsets
+
+
+def douglas_peucker(points, tolerance):
+    """Return a boolean mask of the points of one ring kept by Douglas-Peucker
+
+    Closed rings keep at least four points so they never collapse.
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 4:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start = points[first]
+        dx, dy = points[last] - start
+        offsets = points[first + 1 : last] - start
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(dx * offsets[:, 1] - dy * offsets[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    if np.count_nonzero(keep) < 4:
+        keep[[n // 3, 2 * n // 3]] = True
+    return keep
+
+
+def view_tolerance(bounds, pixels=MAP_PIXELS):
+    """Return the simplification tolerance in degrees for a map fitted to `bounds`"""
+    xmin, xmax, ymin, ymax = bounds
+    return max(xmax - xmin, ymax - ymin) / pixels / 2
+
+
+class CountryGeometry:
+    """Outline of one country stored as flat coordinate arrays"""
+
+    def __init__(self, iso, name, points, ring_offsets, polygon_offsets, properties=None):
+        self.iso = iso
+        self.name = name
+        self.points = points
+        self.ring_offsets = ring_offsets
+        self.polygon_offsets = polygon_offsets
+        self.properties = properties if properties is not None else {"name": name, "ISO3166-1-Alpha-2": iso.upper()}
+
+    @classmethod
+    def from_feature(cls, feature):
+        properties = feature["properties"]
+        iso = properties["ISO3166-1-Alpha-2"].lower()
+        coords = feature["geometry"]["coordinates"]
+        if feature["geometry"]["type"] == "Polygon":
+            coords = [coords]
+        points, ring_offsets, polygon_offsets = pack_coords(coords)
+        points.setflags(write=False)
+        return cls(iso, properties.get("name", iso.upper()), points, ring_offsets, polygon_offsets, properties)
+
+    @cached_property
+    def display_points(self):
+        """Points with antimeridian wrapping applied, computed once per country"""
+        if self.iso not in ANTIMERIDIAN_SHIFTS or len(self.points) == 0:
+            return self.points
+        display_points = self.points.copy()
+        display_points[:, 0] = wrap_longitudes(self.points[:, 0], ANTIMERIDIAN_SHIFTS[self.iso])
+        display_points.setflags(write=False)
+        return display_points
+
+    @cached_property
+    def bounds(self):
+        """(xmin, xmax, ymin, ymax) of the displayed outline"""
+        if len(self.display_points) == 0:
+            return None
+        xmin, ymin = self.display_points.min(axis=0)
+        xmax, ymax = self.display_points.max(axis=0)
+        return float(xmin), float(xmax), float(ymin), float(ymax)
+
+    @property
+    def center(self):
+        xmin, xmax, ymin, ymax = self.bounds
+        return (ymin + ymax) / 2, (xmin + xmax) / 2
+
+    @property
+    def vertex_count(self):
+        return len(self.points)
+
+    @cached_property
+    def view_geometry(self):
+        """Outline simplified for a map fitted to its own bounds, computed once per country"""
+        if self.bounds is None:
+            return self
+        return self.simplify(view_tolerance(self.bounds))
+
+    def simplify(self, tolerance):
+        """Return a copy with every ring simplified to `tolerance` degrees"""
+        keep = np.zeros(len(self.points), dtype=bool)
+        ring_offsets = np.zeros_like(self.ring_offsets)
+        for i in range(len(self.ring_offsets) - 1):
+            first, last = self.ring_offsets[i], self.ring_offsets[i + 1]
+            keep[first:last] = douglas_peucker(self.display_points[first:last], tolerance)
+            ring_offsets[i + 1] = ring_offsets[i] + np.count_nonzero(keep[first:last])
+        points = self.points[keep]
+        points.setflags(write=False)
+        return CountryGeometry(self.iso, self.name, points, ring_offsets, self.polygon_offsets, self.properties)
+
+    def rings(self, lon_offset=0.0, precision=None):
+        """Yield the displayed rings of each polygon as lists of (n, 2) arrays
+
+        With `precision`, coordinates are rounded to that many decimals.
+        """
+        points = self.display_points
+        if lon_offset:
+            points = points + (lon_offset, 0.0)
+        if precision is not None:
+            points = np.round(points, precision)
+        for j in range(len(self.polygon_offsets) - 1):
+            first, last = self.polygon_offsets[j], self.polygon_offsets[j + 1]
+            yield [points[self.ring_offsets[i] : self.ring_offsets[i + 1]] for i in range(first, last)]
+
+    def coords(self, lon_offset=0.0, precision=None):
+        """Return the displayed outline as nested MultiPolygon coordinate lists"""
+        return [[ring.tolist() for ring in polygon] for polygon in self.rings(lon_offset, precision)]
+
+    def payload(self, lon_offset=0.0, precision=None):
+        """Return what the map page needs to show this country, see static/js/country_map.js"""
+        xmin, xmax, ymin, ymax = self.bounds if precision is None else (round(bound, precision) for bound in self.bounds)
+        return {
+            "iso": self.iso,
+            "name": self.name,
+            "bounds": [[ymin, xmin], [ymax, xmax]],
+            "feature": self.view_geometry.as_feature(lon_offset, precision),
+        }
+
+    def as_feature(self, lon_offset=0.0, precision=None):
+        """Return the displayed outline as a GeoJSON feature"""
+        return {
+            "type": "Feature",
+            "properties": self.properties,
+            "geometry": {"type": "MultiPolygon", "coordinates": self.coords(lon_offset, precision)},
+        }
+
+
+# Binary geometry file, built from the GeoJSON by `python geo_catalog.py build`:
+# header, ISO index, float32 lon/lat points, int32 ring and polygon offsets and
+# the feature properties as JSON. Sections are 8-byte aligned so the arrays can
+# be used straight from a read-only mmap shared by all processes.
+BINARY_MAGIC = b"FPGEO\x00\x01\x00"
+BINARY_HEADER = struct.Struct("<8s4I6Q")
+BINARY_INDEX = np.dtype(
+    [
+        ("iso", "S8"),
+        ("point_start", "<i8"),
+        ("ring_start", "<i8"),
+        ("ring_count", "<i8"),
+        ("polygon_start", "<i8"),
+        ("polygon_count", "<i8"),
+    ]
+)
+
+
+def binary_path(geojson_file):
+    return os.path.splitext(geojson_file)[0] + ".fpgeo"
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def write_binary(catalog, path):
+    """Write a catalog to the binary geometry format"""
+    geometries = list(catalog.values())
+    index = np.zeros(len(geometries), dtype=BINARY_INDEX)
+    points, ring_offsets, polygon_offsets = [], [0], [0]
+    n_points = n_rings = 0
+    for entry, geometry in zip(index, geometries):
+        entry["iso"] = geometry.iso.encode("ascii")
+        entry["point_start"] = n_points
+        entry["ring_start"] = n_rings
+        entry["ring_count"] = len(geometry.ring_offsets) - 1
+        entry["polygon_start"] = len(polygon_offsets) - 1
+        entry["polygon_count"] = len(geometry.polygon_offsets) - 1
+        points.append(geometry.points)
+        ring_offsets.extend(geometry.ring_offsets[1:] + n_points)
+        polygon_offsets.extend(geometry.polygon_offsets[1:] + n_rings)
+        n_points += len(geometry.points)
+        n_rings += len(geometry.ring_offsets) - 1
+
+    sections = [
+        index.tobytes(),
+        np.concatenate(points or [np.zeros((0, 2))]).astype("<f4").tobytes(),
+        np.array(ring_offsets, dtype="<i4").tobytes(),
+        np.array(polygon_offsets, dtype="<i4").tobytes(),
+        json.dumps([geometry.properties for geometry in geometries]).encode("utf-8"),
+    ]
+    offsets = []
+    position = BINARY_HEADER.size
+    for section in sections:
+        position = _align(position)
+        offsets.append(position)
+        position += len(section)
+
+    header = BINARY_HEADER.pack(BINARY_MAGIC, len(geometries), n_points, n_rings, len(polygon_offsets) - 1, *offsets, len(sections[-1]))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for offset, section in zip(offsets, sections):
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_path, path)
+
+
+def load_binary(path):
+    """Return a catalog whose coordinate arrays are views into a read-only mmap of `path`"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, n_countries, n_points, n_rings, n_polygons, *offsets, properties_length = BINARY_HEADER.unpack_from(buffer)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a geometry file")
+    index_offset, points_offset, rings_offset, polygons_offset, properties_offset = offsets
+
+    index = np.frombuffer(buffer, dtype=BINARY_INDEX, count=n_countries, offset=index_offset)
+    points = np.frombuffer(buffer, dtype="<f4", count=2 * n_points, offset=points_offset).reshape(-1, 2)
+    ring_offsets = np.frombuffer(buffer, dtype="<i4", count=n_rings + 1, offset=rings_offset)
+    polygon_offsets = np.frombuffer(buffer, dtype="<i4", count=n_polygons + 1, offset=polygons_offset)
+    properties = json.loads(buffer[properties_offset : properties_offset + properties_length])
+
+    catalog = {}
+    for entry, feature_properties in zip(index, properties):
+        iso = entry["iso"].decode("ascii")
+        rings = ring_offsets[entry["ring_start"] : entry["ring_start"] + entry["ring_count"] + 1]
+        polygons = polygon_offsets[entry["polygon_start"] : entry["polygon_start"] + entry["polygon_count"] + 1]
+        geometry = CountryGeometry(
+            iso,
+            feature_properties.get("name", iso.upper()),
+            points[rings[0] : rings[-1]],
+            (rings - rings[0]).astype(np.int64),
+            (polygons - polygons[0]).astype(np.int64),
+            feature_properties,
+        )
+        catalog[iso] = geometry
+    return catalog
+
+
+def load_geojson(geojson_file):
+    """Return a dict mapping lower-case ISO3166-1-Alpha-2 codes to CountryGeometry"""
+    with open(geojson_file, "r", encoding="utf-8") as f:
+        geojson = json.load(f)
+    catalog = {}
+    for feature in geojson["features"]:
+        geometry = CountryGeometry.from_feature(feature)
+        catalog.setdefault(geometry.iso, geometry)
+    return catalog
+
+
+@lru_cache(maxsize=None)
+def load_catalog(geojson_file):
+    """Return the catalog of a GeoJSON file
+
+    Uses the binary file next to it instead when that is at least as new, see
+    `python geo_catalog.py build`.
+    """
+    binary_file = binary_path(geojson_file)
+    if os.path.exists(binary_file) and (not os.path.exists(geojson_file) or os.path.getmtime(binary_file) >= os.path.getmtime(geojson_file)):
+        return load_binary(binary_file)
+    return load_geojson(geojson_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tools for the country outline catalog.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="convert a GeoJSON file to the binary geometry format")
+    build.add_argument("geojson", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "country_outlines", "countries.geojson"))
+    build.add_argument("output", nargs="?", help="defaults to the GeoJSON path with a .fpgeo extension")
+    args = parser.parse_args()
+
+    output = args.output or binary_path(args.geojson)
+    catalog = load_geojson(args.geojson)
+    write_binary(catalog, output)
+    print(f"Wrote {len(catalog)} countries to {output} ({os.path.getsize(output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# gunicorn -c gunicorn.conf.py app:app
+import gc
+import os
+
+# Import the app once in the master; workers are forked from it
+preload_app = True
+
+# GUNICORN_THREADS > 1 serves requests from a thread pool in each worker (gthread),
+# so cheap requests do not wait behind a map render; see RENDER_WORKERS in app.py
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker is forked,
+    # so the loaded data is shared copy-on-write by all workers
+    import app
+
+    app.preload()
+    # Keep the garbage collector from touching (and so copying) the shared objects
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import app
+
+    # Start the render processes before the worker takes requests, not on the first /reveal
+    if app.RENDER_POOL is not None:
+        app.RENDER_POOL.start()
+
+
+def worker_exit(server, worker):
+    import app
+
+    if app.RENDER_POOL is not None:
+        app.RENDER_POOL.shutdown()
@@ -1,14 +1,48 @@
 import os
 import sys
 import json
-from random import randint
+import time
+
+STARTUP_TIME = time.perf_counter()
+
 from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QStyleFactory
-from PyQt6.QtGui import QFont, QAction, QKeySequence
+from PyQt6.QtGui import QFont, QAction, QKeySequence, QImage
 from flag_widget import FlagWidget
-from folium_map_widget import MapWidget, resource_path
+from scheduler import Scheduler
+from session_state import CountryIndex
+from resources import resource_path
 from glob import glob
 from os.path import join
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+# "leaflet" shows the map in a web engine view with online tiles, "svg" draws an
+# offline outline and does not need QtWebEngine at all
+MAP_MODE = os.environ.get("MAP_MODE", "leaflet")
+if MAP_MODE == "svg":
+    from svg_map_widget import SvgMapWidget as MapWidget
+else:
+    # QtWebEngineWidgets can only be imported before the QApplication is created
+    from folium_map_widget import MapWidget
+
+
+class PrefetchSignals(QObject):
+    ready = pyqtSignal(str, QImage)
+
+
+class CountryPrefetcher(QRunnable):
+    """Decode a country's flag and prepare its map payload on a worker thread"""
+
+    def __init__(self, ctry_img, flag_path, map_widget, signals):
+        super().__init__()
+        self.ctry_img = ctry_img
+        self.flag_path = flag_path
+        self.map_widget = map_widget
+        self.signals = signals
+
+    def run(self):
+        image = QImage(self.flag_path)
+        self.map_widget.map_cache.get(self.ctry_img)
+        self.signals.ready.emit(self.ctry_img, image)
 
 
 class CentralWidget(QWidget):
@@ -23,12 +57,18 @@ class CentralWidget(QWidget):
         self.image_layout = QHBoxLayout()
         self.button_layout = QHBoxLayout()
         self.country_names = self.load_country_names()
+        self.scheduler = Scheduler(CountryIndex(self.country_names.keys()).full())
         self.no_countries_label = QLabel(parent=self)
         self.no_countries_label.setFont(QFont("Sans Serif", 30))
         self.update_no_countries_label()
 
-        ctry_img, ctry_name, ctry_idx = self.get_random_country()
-        self.country_idx = ctry_idx
+        ctry_img, ctry_name = self.get_random_country()
+        self.current_country = ctry_img
+        self.next_country = None
+        self.next_image = None
+        # Owned by the widget so it outlives worker threads that finish after a newer prefetch started
+        self.prefetch_signals = PrefetchSignals(self)
+        self.prefetch_signals.ready.connect(self.on_country_prefetched)
         self.flag_widget = FlagWidget(join(self.flags_folder, ctry_img + ".png"), ctry_name, parent=self)
 
         self.map_widget = MapWidget(parent=self)
@@ -63,6 +103,7 @@ class CentralWidget(QWidget):
         self.setLayout(self.layout)
 
         self.set_connections()
+        self.prefetch_next_country()
 
     def set_connections(self):
         self.reveal_button.clicked.connect(self.reveal_country_name)
@@ -87,8 +128,12 @@ class CentralWidget(QWidget):
             self.remove_button.show()
         else:
             self.reveal_mode = True
+            if self.current_country in self.scheduler.remaining:
+                # Moving on without removing the country counts as a miss
+                self.scheduler.record_miss(self.current_country)
             ctry_img = self.update_flag_widget()
             self.map_widget.update_map(ctry_img)
+            self.prefetch_next_country()
             self.update_no_countries_label()
             self.name_label.setText("?")
             self.reveal_button.setText("Reveal")
@@ -96,29 +141,50 @@ class CentralWidget(QWidget):
             self.remove_button.hide()
 
     def remove_country_from_list(self):
-        if len(self.country_names) <= 1:
+        if len(self.scheduler) <= 1:
             return
-        self.country_names.pop(self.country_idx)
+        # The prefetched country is never the current one (prefetches exclude it), so
+        # it stays valid after the removal
+        self.scheduler.remove(self.current_country)
         self.reveal_country_name()
 
-    def get_random_country(self):
-        country_idx = randint(0, len(self.country_names) - 1)
-        file_name, ctry_name = self.country_names[country_idx]
-        self.country_idx = country_idx
-        return file_name, ctry_name, country_idx
+    def get_random_country(self, exclude=None):
+        file_name = self.scheduler.draw(exclude=exclude)
+        return file_name, self.country_names[file_name]
+
+    def prefetch_next_country(self):
+        """Pick the following country now and prepare its flag and map in the background"""
+        ctry_img, ctry_name = self.get_random_country(exclude=self.current_country)
+        self.next_country = (ctry_img, ctry_name)
+        self.next_image = None
+        QThreadPool.globalInstance().start(CountryPrefetcher(ctry_img, join(self.flags_folder, ctry_img + ".png"), self.map_widget, self.prefetch_signals))
+
+    def on_country_prefetched(self, ctry_img, image):
+        # Results for a country that was replaced in the meantime are dropped
+        if self.next_country is not None and self.next_country[0] == ctry_img:
+            self.next_image = image
 
     def update_flag_widget(self):
-        ctry_img, ctry_name, _ = self.get_random_country()
-        self.flag_widget.set_flag_path(join(self.flags_folder, ctry_img + ".png"), ctry_name)
+        if self.next_country is None:
+            self.prefetch_next_country()
+        ctry_img, ctry_name = self.next_country
+        flag_path = join(self.flags_folder, ctry_img + ".png")
+        if self.next_image is not None:
+            self.flag_widget.set_flag_image(flag_path, ctry_name, self.next_image)
+        else:
+            self.flag_widget.set_flag_path(flag_path, ctry_name)
+        self.current_country = ctry_img
+        self.next_country = None
+        self.next_image = None
         return ctry_img
 
     def update_no_countries_label(self):
-        self.no_countries_label.setText(f"Number of countries left: {len(self.country_names)}")
+        self.no_countries_label.setText(f"Number of countries left: {len(self.scheduler)}")
 
     def load_country_names(self):
         with open(self.countries_json, "r", encoding="utf-8") as f:
             names_dict = json.load(f)
-            return [(key.lower(), value) for key, value in names_dict.items()]
+            return {key.lower(): value for key, value in names_dict.items()}
 
 
 class MainWindow(QMainWindow):
@@ -143,7 +209,13 @@ def main():
     app.setFont(QFont("Sans Serif", 50))
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
+    # Reported once the event loop has painted the first frame
+    QTimer.singleShot(0, lambda: print(f"Startup took {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms", file=sys.stderr))
+    status = app.exec()
+    # Flag decodes and prefetches still running emit on signals objects owned by the
+    # widgets, so let them finish before the widgets are deleted
+    QThreadPool.globalInstance().waitForDone()
+    sys.exit(status)
 
 
 if __name__ == "__main__":
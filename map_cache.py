@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class MapCache:
+    """Bounded LRU cache of rendered map markup, keyed by country ISO code
+
+    `render` is called with the ISO code on a miss. If `directory` is given,
+    rendered markup is also stored there as `<iso>.html` and read back on
+    later misses, so a pre-filled directory can be shared between processes.
+    `suffix` replaces the `.html` extension for other kinds of markup.
+    """
+
+    def __init__(self, render, maxsize=64, directory=None, suffix=".html"):
+        self.render = render
+        self.maxsize = maxsize
+        self.directory = directory
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, country_iso):
+        key = country_iso.lower()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        html = self._load(key)
+        if html is None:
+            html = self.render(key)
+            self._store(key, html)
+        self._insert(key, html)
+        return html
+
+    def warm(self, country_isos):
+        """Render every country in `country_isos` that is not cached yet
+
+        With a directory the maps are only written there, since that is the
+        cache that outlives this process; otherwise they fill the memory cache.
+        """
+        for country_iso in country_isos:
+            key = country_iso.lower()
+            if self.directory is not None:
+                cached = os.path.exists(self._path(key))
+            else:
+                with self._lock:
+                    cached = key in self._entries
+            with self._lock:
+                if cached:
+                    self.hits += 1
+                    continue
+                self.misses += 1
+            html = self.render(key)
+            if self.directory is not None:
+                self._store(key, html)
+            else:
+                self._insert(key, html)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def _insert(self, key, html):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, key, html):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so other workers never read a partial file
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, self._path(key))
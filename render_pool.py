@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+class PoolSaturated(Exception):
+    """Raised instead of queueing a render when the pool already has `max_pending` renders"""
+
+
+class RenderPool:
+    """Runs CPU-heavy renders in a bounded pool of processes
+
+    Concurrent requests for the same key share one render. When `max_pending`
+    different keys are already being rendered, new keys are refused with
+    PoolSaturated instead of queueing behind them, so callers can answer
+    "try again" right away. `render` and `initializer` must be module-level
+    functions so the worker processes can import them.
+    """
+
+    def __init__(self, render, workers, max_pending=None, initializer=None, timeout=30):
+        self.render_function = render
+        self.workers = workers
+        self.max_pending = max_pending if max_pending is not None else 2 * workers
+        self.initializer = initializer
+        self.timeout = timeout
+        self.rendered = 0
+        self.shared = 0
+        self.rejected = 0
+        self._executor = None
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Started on first use in each process, so a gunicorn master never owns one
+        if self._executor is None or self._pid != os.getpid():
+            # forkserver: forking a process that runs request threads is not safe
+            context = multiprocessing.get_context("forkserver")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=self.initializer)
+            self._pid = os.getpid()
+        return self._executor
+
+    def start(self):
+        """Start the worker processes now instead of on the first render"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(os.getpid)
+
+    def submit(self, key):
+        """Return the future of the render of `key`, starting one unless it is already running"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"{len(self._pending)} renders pending")
+            try:
+                future = self._get_executor().submit(self.render_function, key)
+            except BrokenProcessPool:
+                # A worker process died (e.g. killed for memory); start a fresh pool
+                self._executor = None
+                future = self._get_executor().submit(self.render_function, key)
+            self._pending[key] = future
+            self.rendered += 1
+        future.add_done_callback(lambda _: self._done(key, future))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def render(self, key):
+        """Render `key` in the pool and wait for it; usable as the `render` of a MapCache"""
+        try:
+            return self.submit(key).result(timeout=self.timeout)
+        except TimeoutError:
+            raise PoolSaturated(f"render of {key} took longer than {self.timeout} s") from None
+
+    def stats(self):
+        return {
+            "rendered": self.rendered,
+            "shared": self.shared,
+            "rejected": self.rejected,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+        }
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
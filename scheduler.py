@@ -0,0 +1,149 @@
+import base64
+import random
+
+# A country's weight doubles with every miss, up to 2 ** MAX_MISSES times the
+# weight of a country that was never missed
+MAX_MISSES = 4
+
+
+class FenwickTree:
+    """Binary indexed tree over integer weights: O(log n) updates, prefix sums and weighted search"""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.tree = [0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def total(self):
+        return self.prefix_sum(self.size)
+
+    def prefix_sum(self, count):
+        """Sum of the first `count` weights"""
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def set(self, i, weight):
+        delta = weight - self.weights[i]
+        self.weights[i] = weight
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value):
+        """Return the index i with prefix_sum(i) <= value < prefix_sum(i + 1)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            following = position + step
+            if following <= self.size and self.tree[following] <= value:
+                position = following
+                value -= self.tree[following]
+            step >>= 1
+        return position
+
+
+def encode_misses(misses, index):
+    """Pack per-country miss counts (0 to 15) over a CountryIndex into a URL-safe string
+
+    Two counts per byte, after the fingerprint of the index's country list.
+    """
+    data = bytes(misses[i] | (misses[i + 1] if i + 1 < len(misses) else 0) << 4 for i in range(0, len(misses), 2))
+    return base64.urlsafe_b64encode(index.fingerprint + data).rstrip(b"=").decode("ascii")
+
+
+def decode_misses(token, index):
+    """Return the miss counts packed by encode_misses, or all zeros if `token` does not fit `index`"""
+    count = len(index.codes)
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        data = b""
+    fingerprint = len(index.fingerprint)
+    if len(data) != fingerprint + (count + 1) // 2 or data[:fingerprint] != index.fingerprint:
+        return bytearray(count)
+    misses = bytearray(count)
+    for i, byte in enumerate(data[fingerprint:]):
+        misses[2 * i] = byte & 15
+        if 2 * i + 1 < count:
+            misses[2 * i + 1] = byte >> 4
+    return misses
+
+
+class Scheduler:
+    """Weighted random order of the remaining countries, favouring the ones missed before
+
+    `remaining` is a CountrySet and `misses` a bytearray of miss counts in the
+    order of its CountryIndex. Building is O(n); draws, removals and miss
+    updates are O(log n).
+    """
+
+    def __init__(self, remaining, misses=None):
+        self.remaining = remaining
+        self.index = remaining.index
+        self.misses = misses if misses is not None else bytearray(len(self.index.codes))
+        self.tree = FenwickTree([self.weight(code) for code in self.index.codes])
+
+    def weight(self, code):
+        if code not in self.remaining:
+            return 0
+        return 1 << min(self.misses[self.index.positions[code]], MAX_MISSES)
+
+    def __len__(self):
+        return len(self.remaining)
+
+    def draw(self, exclude=None, rng=random):
+        """Return a weighted random remaining country, avoiding `exclude` unless it is the only one left"""
+        excluded = self.index.positions.get(exclude)
+        excluded_weight = 0
+        if excluded is not None and len(self.remaining) > 1:
+            excluded_weight = self.tree.weights[excluded]
+            self.tree.set(excluded, 0)
+        try:
+            total = self.tree.total()
+            if total == 0:
+                raise IndexError("draw from an empty Scheduler")
+            return self.index.codes[self.tree.find(rng.randrange(total))]
+        finally:
+            if excluded_weight:
+                self.tree.set(excluded, excluded_weight)
+
+    def draw_many(self, count, rng=random):
+        """Return up to `count` distinct weighted random remaining countries, O(count log n)"""
+        drawn = []
+        saved = []
+        try:
+            while len(drawn) < count and self.tree.total() > 0:
+                position = self.tree.find(rng.randrange(self.tree.total()))
+                drawn.append(self.index.codes[position])
+                saved.append((position, self.tree.weights[position]))
+                self.tree.set(position, 0)
+        finally:
+            for position, weight in saved:
+                self.tree.set(position, weight)
+        return drawn
+
+    def remove(self, code):
+        """The country is known; take it out of the game"""
+        position = self.index.positions.get(code)
+        if position is None:
+            return
+        self.remaining.discard(code)
+        self.tree.set(position, 0)
+
+    def record_miss(self, code):
+        position = self.index.positions.get(code)
+        if position is None:
+            return
+        self.misses[position] = min(self.misses[position] + 1, 15)
+        self.tree.set(position, self.weight(code))
+
+    def encode_misses(self):
+        return encode_misses(self.misses, self.index)
@@ -0,0 +1,63 @@
+import base64
+import hashlib
+
+# Bytes of the hash of the country list put in front of every encoded CountrySet
+FINGERPRINT_SIZE = 4
+
+
+class CountryIndex:
+    """Stable numbering of the quiz countries, sorted by ISO code"""
+
+    def __init__(self, codes):
+        self.codes = tuple(sorted(codes))
+        self.positions = {code: i for i, code in enumerate(self.codes)}
+        self.size = (len(self.codes) + 7) // 8
+        # Tells tokens of this index from tokens of an index with other countries, whose
+        # bits would otherwise be read as the wrong countries when the sizes match
+        self.fingerprint = hashlib.sha256(",".join(self.codes).encode("utf-8")).digest()[:FINGERPRINT_SIZE]
+
+    def full(self):
+        return CountrySet(self, (1 << len(self.codes)) - 1)
+
+    def decode(self, token):
+        """Return the CountrySet encoded in `token`, or None if it does not match this index"""
+        try:
+            data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (ValueError, TypeError):
+            return None
+        if len(data) != FINGERPRINT_SIZE + self.size or data[:FINGERPRINT_SIZE] != self.fingerprint:
+            return None
+        return CountrySet(self, int.from_bytes(data[FINGERPRINT_SIZE:], "little") & ((1 << len(self.codes)) - 1))
+
+
+class CountrySet:
+    """Set of countries stored as a bitset over a CountryIndex
+
+    Encodes to a short URL-safe string (a fingerprint of the country list and
+    one bit per country), so it is cheap to keep in a session.
+    """
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = bits
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __contains__(self, code):
+        position = self.index.positions.get(code)
+        return position is not None and bool(self.bits >> position & 1)
+
+    def __iter__(self):
+        for position, code in enumerate(self.index.codes):
+            if self.bits >> position & 1:
+                yield code
+
+    def discard(self, code):
+        position = self.index.positions.get(code)
+        if position is not None:
+            self.bits &= ~(1 << position)
+
+    def encode(self):
+        data = self.index.fingerprint + self.bits.to_bytes(self.index.size, "little")
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
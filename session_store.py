@@ -0,0 +1,178 @@
+import abc
+import json
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Share of session writes that also delete the sessions not written to within
+# PERMANENT_SESSION_LIFETIME, so visits that never come back do not pile up
+PURGE_PROBABILITY = 0.001
+
+
+class SessionStore(abc.ABC):
+    """Where server-side sessions live; data is a JSON-serializable dict"""
+
+    @abc.abstractmethod
+    def load(self, session_id):
+        """Return the data of a session, or None if it does not exist"""
+
+    @abc.abstractmethod
+    def save(self, session_id, data):
+        """Store the data of a session, replacing what was there"""
+
+    @abc.abstractmethod
+    def delete(self, session_id):
+        """Delete a session if it exists"""
+
+    @abc.abstractmethod
+    def count(self):
+        """Return the number of stored sessions"""
+
+    @abc.abstractmethod
+    def purge(self, max_age):
+        """Delete sessions not written to for `max_age` seconds"""
+
+
+class MemoryStore(SessionStore):
+    """Sessions in a dict; only for tests and single-process servers"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return None if entry is None else json.loads(entry[1])
+
+    def save(self, session_id, data):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), json.dumps(data))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def count(self):
+        return len(self._sessions)
+
+    def purge(self, max_age):
+        cutoff = time.time() - max_age
+        with self._lock:
+            for session_id in [key for key, (updated, _) in self._sessions.items() if updated < cutoff]:
+                del self._sessions[session_id]
+
+
+class SQLiteStore(SessionStore):
+    """Sessions in a SQLite database in WAL mode, shared by all worker processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # The store is created when app.py is imported, i.e. in the gunicorn master
+        # with preload_app, so this connection is closed rather than kept for later
+        db = self._open()
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        db.close()
+
+    def _open(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _connect(self):
+        # One connection per thread and process: sqlite3 connections must not be shared
+        # between threads, nor carried across fork() into a worker
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = self._local.db = self._open()
+            self._local.pid = os.getpid()
+        return db
+
+    def load(self, session_id):
+        row = self._connect().execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save(self, session_id, data):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO sessions (id, data, updated) VALUES (?, ?, ?)", (session_id, json.dumps(data), time.time()))
+
+    def delete(self, session_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def purge(self, max_age):
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age,))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, session_id, data=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(data, on_update)
+        self.session_id = session_id
+        self.new = new
+        self.modified = False
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface that keeps session data in a SessionStore
+
+    The cookie only carries an opaque random session ID. Changes made during a
+    request are written to the store once, when the response is sent.
+    """
+
+    def __init__(self, store, purge_probability=PURGE_PROBABILITY):
+        self.store = store
+        self.purge_probability = purge_probability
+
+    def open_session(self, app, request):
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if session_id:
+            data = self.store.load(session_id)
+            if data is not None:
+                return ServerSession(session_id, data)
+        return ServerSession(secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.session_id)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.store.save(session.session_id, dict(session))
+            if random.random() < self.purge_probability:
+                self.store.purge(app.permanent_session_lifetime.total_seconds())
+        if session.new or self.should_set_cookie(app, session):
+            self.set_session_cookie(app, session, response)
+
+    def set_session_cookie(self, app, session, response):
+        """Point the client at `session`, with the SESSION_COOKIE_* settings of the app"""
+        response.set_cookie(
+            self.get_cookie_name(app),
+            session.session_id,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
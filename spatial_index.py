@@ -0,0 +1,151 @@
+"""Which country contains a point, and how far a point is from a country.
+
+SpatialIndex packs the bounding boxes of every polygon in the outline
+catalog into an STR (sort-tile-recursive) R-tree. A lookup walks the tree to
+the few polygons whose box contains the point and runs an exact even-odd
+point-in-polygon test on their edges with numpy.
+"""
+
+import json
+import math
+
+import numpy as np
+
+# Children per R-tree node
+NODE_CAPACITY = 16
+EARTH_RADIUS_KM = 6371.0088
+
+
+def normalize_longitude(lon):
+    """Map any longitude, e.g. from a map panned across the antimeridian, into [-180, 180)"""
+    return (lon + 180) % 360 - 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def load_centroids(path):
+    """Return a dict mapping lower-case ISO codes to the (lat, lon) of the country's centroid"""
+    with open(path, "r", encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    centroids = {}
+    for feature in features:
+        lon, lat = feature["geometry"]["coordinates"][:2]
+        centroids.setdefault(feature["properties"]["ISO"].lower(), (lat, lon))
+    return centroids
+
+
+def contains_point(points, ring_offsets, x, y):
+    """Even-odd test of (x, y) against the rings points[ring_offsets[i]:ring_offsets[i + 1]]
+
+    Rings are closed (first point repeated at the end), so every edge joins two
+    consecutive points of the same ring; holes are handled by the even-odd rule.
+    """
+    start = ring_offsets[0]
+    segment = points[start : ring_offsets[-1]]
+    a, b = segment[:-1], segment[1:]
+    valid = np.ones(len(a), dtype=bool)
+    # Drop the edges that would join the last point of a ring to the first of the next
+    valid[np.asarray(ring_offsets[1:-1]) - start - 1] = False
+    ax, ay, bx, by = a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+    straddles = (ay > y) != (by > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = ax + (y - ay) * (bx - ax) / (by - ay)
+    return bool(np.count_nonzero(valid & straddles & (x < crossing)) % 2)
+
+
+class SpatialIndex:
+    """STR R-tree over the polygons of an outline catalog (see geo_catalog.load_catalog)"""
+
+    def __init__(self, catalog, centroids=None):
+        self.catalog = catalog
+        self.centroids = centroids or {}
+        # One entry per polygon: its country and (xmin, xmax, ymin, ymax) in raw lon/lat
+        self.entries = []
+        boxes = []
+        for geometry in catalog.values():
+            for j in range(len(geometry.polygon_offsets) - 1):
+                first, last = geometry.ring_offsets[geometry.polygon_offsets[j]], geometry.ring_offsets[geometry.polygon_offsets[j + 1]]
+                if last - first < 4:
+                    continue
+                points = geometry.points[first:last]
+                xmin, ymin = points.min(axis=0)
+                xmax, ymax = points.max(axis=0)
+                self.entries.append((geometry, j))
+                boxes.append((xmin, xmax, ymin, ymax))
+        self.levels = self._pack(np.array(boxes, dtype=np.float64).reshape(-1, 4))
+
+    @staticmethod
+    def _pack(boxes):
+        """Build the tree bottom-up; return its levels from the leaves up
+
+        Each level is (boxes, children, order): `boxes` are the level's entries
+        sorted into nodes, node i of the level above covers boxes[children[i]:
+        children[i + 1]], and boxes[p] is entry order[p] of the level. The
+        last level has a single node above it, the root.
+        """
+        levels = []
+        count = len(boxes)
+        while True:
+            node_count = max(1, math.ceil(count / NODE_CAPACITY))
+            slabs = math.ceil(math.sqrt(node_count))
+            slab_size = slabs * NODE_CAPACITY
+            centers = np.column_stack(((boxes[:, 0] + boxes[:, 1]) / 2, (boxes[:, 2] + boxes[:, 3]) / 2))
+            # Sort by x into vertical slabs, then by y within each slab
+            order = np.argsort(centers[:, 0], kind="stable")
+            for first in range(0, count, slab_size):
+                slab = order[first : first + slab_size]
+                order[first : first + slab_size] = slab[np.argsort(centers[slab, 1], kind="stable")]
+            children = np.minimum(np.arange(node_count + 1) * NODE_CAPACITY, count)
+            sorted_boxes = boxes[order]
+            node_boxes = np.empty((node_count, 4))
+            for i in range(node_count):
+                group = sorted_boxes[children[i] : children[i + 1]]
+                node_boxes[i] = group[:, 0].min(), group[:, 1].max(), group[:, 2].min(), group[:, 3].max()
+            levels.append((sorted_boxes, children, order))
+            if node_count == 1:
+                return levels
+            boxes, count = node_boxes, node_count
+
+    def candidates(self, lon, lat):
+        """Return the indices of the polygons whose bounding box contains the point"""
+        nodes = [0]
+        # Walk down from the root, keeping the children whose boxes contain the point
+        for boxes, children, order in reversed(self.levels):
+            if len(nodes) == 0:
+                break
+            positions = np.concatenate([np.arange(children[i], children[i + 1]) for i in nodes])
+            hit = boxes[positions]
+            inside = (hit[:, 0] <= lon) & (lon <= hit[:, 1]) & (hit[:, 2] <= lat) & (lat <= hit[:, 3])
+            nodes = order[positions[inside]]
+        return nodes
+
+    def locate(self, lat, lon):
+        """Return the ISO code of the country containing the point, or None at sea"""
+        lon = normalize_longitude(lon)
+        for entry in self.candidates(lon, lat):
+            geometry, j = self.entries[entry]
+            rings = geometry.ring_offsets[geometry.polygon_offsets[j] : geometry.polygon_offsets[j + 1] + 1]
+            if contains_point(geometry.points, rings, lon, lat):
+                return geometry.iso
+        return None
+
+    def centroid(self, country_iso):
+        """Return the (lat, lon) of a country's centroid, falling back to the center of its bounds"""
+        if country_iso in self.centroids:
+            return self.centroids[country_iso]
+        geometry = self.catalog.get(country_iso)
+        if geometry is None or geometry.bounds is None:
+            return None
+        lat, lon = geometry.center
+        return lat, normalize_longitude(lon)
+
+    def distance_km(self, lat, lon, country_iso):
+        """Return the great-circle distance from the point to a country's centroid"""
+        centroid = self.centroid(country_iso)
+        if centroid is None:
+            return None
+        return haversine_km(lat, lon, *centroid)
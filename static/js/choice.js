@@ -0,0 +1,72 @@
+// Multiple choice: the country is named and the player picks its flag among
+// look-alikes. Every flag is a region of one sprite image, so a question costs
+// one small JSON request and no image downloads.
+var THUMBNAIL_SCALE = 2;
+var NEXT_QUESTION_MS = 1200;
+
+function startChoices(config) {
+    var atlas = config.atlas;
+    var answered = false;
+
+    function element(id) {
+        return document.getElementById(id);
+    }
+
+    function thumbnail(option) {
+        var x = option.rect[0], y = option.rect[1], width = option.rect[2], height = option.rect[3];
+        var button = document.createElement("button");
+        button.className = "choice";
+        button.dataset.iso = option.iso;
+        button.style.width = width * THUMBNAIL_SCALE + "px";
+        button.style.height = height * THUMBNAIL_SCALE + "px";
+        button.style.backgroundImage = "url(" + atlas.image + ")";
+        button.style.backgroundSize = atlas.width * THUMBNAIL_SCALE + "px " + atlas.height * THUMBNAIL_SCALE + "px";
+        button.style.backgroundPosition = -x * THUMBNAIL_SCALE + "px " + -y * THUMBNAIL_SCALE + "px";
+        button.addEventListener("click", function () { answer(option.iso); });
+        return button;
+    }
+
+    function ask() {
+        fetch(config.url, { credentials: "same-origin" })
+            .then(function (response) { return response.json(); })
+            .then(function (question) {
+                element("remaining").textContent = question.remaining;
+                element("choice-result").textContent = "";
+                var options = element("options");
+                options.replaceChildren();
+                if (question.name === null) {
+                    element("country-name").textContent = "All countries completed!";
+                    return;
+                }
+                element("country-name").textContent = question.name;
+                question.options.forEach(function (option) { options.appendChild(thumbnail(option)); });
+                answered = false;
+            });
+    }
+
+    function answer(iso) {
+        if (answered) {
+            return;
+        }
+        answered = true;
+        fetch(config.url, {
+            method: "POST",
+            credentials: "same-origin",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ iso: iso }),
+        })
+            .then(function (response) { return response.json(); })
+            .then(function (result) {
+                element("remaining").textContent = result.remaining;
+                element("choice-result").textContent = result.correct ? "Correct!" : "Wrong";
+                document.querySelectorAll("#options .choice").forEach(function (button) {
+                    if (button.dataset.iso === result.answer) {
+                        button.classList.add("answer");
+                    }
+                });
+                setTimeout(ask, NEXT_QUESTION_MS);
+            });
+    }
+
+    ask();
+}
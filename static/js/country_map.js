@@ -0,0 +1,46 @@
+// Leaflet map that stays loaded while only the country outline is swapped.
+// Shared by the web page and the desktop MapWidget.
+var countryMap = null;
+var countryLayer = null;
+
+function initCountryMap(elementId) {
+    countryMap = L.map(elementId, { minZoom: 1, maxZoom: 20 });
+    L.tileLayer("https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", {
+        attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>',
+        subdomains: "abcd",
+        maxZoom: 20,
+    }).addTo(countryMap);
+    countryMap.setView([0, 0], 1);
+    return countryMap;
+}
+
+// payload: {"iso": ..., "name": ..., "bounds": [[south, west], [north, east]], "feature": GeoJSON}
+function showCountry(payload, style) {
+    if (countryLayer !== null) {
+        countryMap.removeLayer(countryLayer);
+    }
+    countryLayer = L.geoJSON(payload.feature, { style: style || { weight: 1 } }).addTo(countryMap);
+    countryMap.invalidateSize();
+    countryMap.fitBounds(payload.bounds);
+}
+
+// Click-to-guess: the server answers which country was clicked and how far it is from the answer
+function guessOnClick(guessUrl, resultElement) {
+    var marker = null;
+    countryMap.on("click", function (event) {
+        var url = guessUrl + "?lat=" + event.latlng.lat + "&lon=" + event.latlng.lng;
+        fetch(url, { credentials: "same-origin" })
+            .then(function (response) { return response.json(); })
+            .then(function (result) {
+                if (marker !== null) {
+                    countryMap.removeLayer(marker);
+                }
+                marker = L.circleMarker(event.latlng, { radius: 6, color: result.correct ? "green" : "red" }).addTo(countryMap);
+                if (result.correct) {
+                    resultElement.textContent = "Correct!";
+                } else {
+                    resultElement.textContent = (result.clicked_name || "Sea") + ", " + Math.round(result.distance_km) + " km off";
+                }
+            });
+    });
+}
@@ -0,0 +1,96 @@
+// Round source for the static export: the same interface as /api/round, with the
+// game state (remaining countries, misses, current batch) kept in localStorage.
+var LOCAL_STATE_KEY = "flagPuzzle";
+// Same weighting as scheduler.py: a country's weight doubles with every miss, up to 16
+var MAX_MISSES = 4;
+
+function localRounds(countriesUrl, batchSize) {
+    var countries = null;
+
+    function loadCountries() {
+        if (countries === null) {
+            countries = fetch(countriesUrl).then(function (response) { return response.json(); });
+        }
+        return countries;
+    }
+
+    function loadState(byIso) {
+        var state = null;
+        try {
+            state = JSON.parse(localStorage.getItem(LOCAL_STATE_KEY));
+        } catch (error) {
+            state = null;
+        }
+        if (state === null || !Array.isArray(state.remaining)) {
+            state = { remaining: Object.keys(byIso), misses: {}, batch: [] };
+        }
+        // Drop countries that are no longer in the export
+        state.remaining = state.remaining.filter(function (iso) { return iso in byIso; });
+        return state;
+    }
+
+    function saveState(state) {
+        localStorage.setItem(LOCAL_STATE_KEY, JSON.stringify(state));
+    }
+
+    function draw(state, count) {
+        var pool = state.remaining.map(function (iso) {
+            return { iso: iso, weight: 1 << Math.min(state.misses[iso] || 0, MAX_MISSES) };
+        });
+        var total = pool.reduce(function (sum, entry) { return sum + entry.weight; }, 0);
+        var drawn = [];
+        while (drawn.length < count && total > 0) {
+            var value = Math.random() * total;
+            for (var i = 0; i < pool.length; i++) {
+                value -= pool[i].weight;
+                if (value < 0 || i === pool.length - 1) {
+                    break;
+                }
+            }
+            drawn.push(pool[i].iso);
+            total -= pool[i].weight;
+            pool.splice(i, 1);
+        }
+        return drawn;
+    }
+
+    function byIsoOf(list) {
+        var byIso = {};
+        list.forEach(function (country) { byIso[country.iso] = country; });
+        return byIso;
+    }
+
+    return {
+        fetchBatch: function () {
+            return loadCountries().then(function (list) {
+                var byIso = byIsoOf(list);
+                var state = loadState(byIso);
+                var remaining = new Set(state.remaining);
+                var batch = (state.batch || []).filter(function (iso) { return remaining.has(iso); });
+                if (batch.length === 0) {
+                    batch = draw(state, batchSize);
+                }
+                state.batch = batch;
+                saveState(state);
+                return {
+                    remaining: state.remaining.length,
+                    countries: batch.map(function (iso) { return byIso[iso]; }),
+                };
+            });
+        },
+        sendResults: function (results, unloading) {
+            // localStorage is synchronous, so this is safe while the page unloads
+            var state = JSON.parse(localStorage.getItem(LOCAL_STATE_KEY));
+            var removed = new Set(results.removed);
+            state.remaining = state.remaining.filter(function (iso) { return !removed.has(iso); });
+            results.missed.forEach(function (iso) {
+                state.misses[iso] = Math.min((state.misses[iso] || 0) + 1, 15);
+            });
+            if (results.done) {
+                state.batch = [];
+            }
+            saveState(state);
+            return Promise.resolve({ remaining: state.remaining.length });
+        },
+    };
+}
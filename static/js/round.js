@@ -0,0 +1,124 @@
+// Plays the quiz in batches: one request fetches the next countries, one request
+// reports what happened to them, and everything in between runs in the page.
+//
+// source.fetchBatch() resolves to {"remaining": n, "countries": [{iso, name, flag, geometry}]},
+// source.sendResults(results, unloading) reports {"removed": [...], "missed": [...], "done": bool}.
+// unloading is true when the page is being closed and the request must not be waited for.
+var MAP_STYLE = { color: "blue", weight: 2, fillColor: "#55ff00" };
+var FLAG_SIZES = "(max-width: 800px) 90vw, 800px";
+
+function startRounds(source) {
+    var batch = [];
+    var position = 0;
+    var remaining = 0;
+    var results = { removed: [], missed: [] };
+    var mapStarted = false;
+
+    function element(id) {
+        return document.getElementById(id);
+    }
+
+    function setFlag(flag) {
+        element("flag-webp").srcset = flag.webp;
+        element("flag").srcset = flag.png;
+        element("flag").src = flag.src;
+    }
+
+    function preload(country) {
+        // Let the browser fetch the flag variant and outline it will need next
+        var image = new Image();
+        image.sizes = FLAG_SIZES;
+        image.srcset = country.flag.webp || country.flag.png;
+        image.src = country.flag.src;
+        if (country.geometry) {
+            fetch(country.geometry);
+        }
+    }
+
+    function show() {
+        var country = batch[position];
+        element("remaining").textContent = remaining;
+        element("country-name").textContent = "?";
+        element("map").style.display = "none";
+        element("reveal").style.display = "";
+        element("next").style.display = "none";
+        element("remove").style.display = "none";
+        setFlag(country.flag);
+        if (position + 1 < batch.length) {
+            preload(batch[position + 1]);
+        }
+    }
+
+    function finish() {
+        element("remaining").textContent = 0;
+        element("country-name").textContent = "All countries completed!";
+        element("buttons").style.display = "none";
+        element("container").style.display = "none";
+    }
+
+    function loadBatch() {
+        return source.fetchBatch().then(function (data) {
+            batch = data.countries;
+            position = 0;
+            remaining = data.remaining;
+            if (batch.length === 0) {
+                finish();
+            } else {
+                show();
+            }
+        });
+    }
+
+    function reveal() {
+        var country = batch[position];
+        element("country-name").textContent = country.name;
+        element("reveal").style.display = "none";
+        element("next").style.display = "";
+        element("remove").style.display = "";
+        if (!country.geometry) {
+            return;
+        }
+        element("map").style.display = "";
+        if (!mapStarted) {
+            initCountryMap("leaflet-map");
+            mapStarted = true;
+        }
+        fetch(country.geometry)
+            .then(function (response) { return response.json(); })
+            .then(function (payload) { showCountry(payload, MAP_STYLE); });
+    }
+
+    function advance(known) {
+        var country = batch[position];
+        if (known) {
+            results.removed.push(country.iso);
+            remaining -= 1;
+        } else {
+            results.missed.push(country.iso);
+        }
+        position += 1;
+        if (position < batch.length) {
+            show();
+            return;
+        }
+        var sent = results;
+        results = { removed: [], missed: [] };
+        sent.done = true;
+        source.sendResults(sent, false).then(loadBatch);
+    }
+
+    element("reveal").addEventListener("click", reveal);
+    element("next").addEventListener("click", function () { advance(false); });
+    element("remove").addEventListener("click", function () { advance(true); });
+
+    window.addEventListener("pagehide", function () {
+        if (results.removed.length || results.missed.length) {
+            var sent = results;
+            results = { removed: [], missed: [] };
+            sent.done = false;
+            source.sendResults(sent, true);
+        }
+    });
+
+    return loadBatch();
+}
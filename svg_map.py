@@ -0,0 +1,112 @@
+"""Offline country maps: a country and its neighbours drawn as a small SVG.
+
+Needs no tiles, no JavaScript and no network, so it works anywhere the
+outline catalog does. Outlines are projected to Web Mercator with numpy and
+simplified to what is visible at the rendered size.
+"""
+
+import math
+
+import numpy as np
+
+from geo_catalog import view_tolerance
+
+SVG_WIDTH = 800
+SVG_HEIGHT = 450
+# Fraction of the country's extent left free on each side
+SVG_MARGIN = 0.15
+# Web Mercator is cut off here, like tile maps do
+MAX_LATITUDE = 85.0511287798
+
+SEA_COLOR = "#d4e6f1"
+NEIGHBOUR_STYLE = 'fill="#f2efe9" stroke="#9a9a9a" stroke-width="0.6"'
+COUNTRY_STYLE = 'fill="#55ff00" stroke="blue" stroke-width="2"'
+
+
+def mercator(points):
+    """Project (n, 2) lon/lat degrees to Web Mercator, in radians of longitude"""
+    lat = np.radians(np.clip(points[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    return np.column_stack((np.radians(points[:, 0]), np.log(np.tan(np.pi / 4 + lat / 2))))
+
+
+def inverse_latitude(y):
+    return math.degrees(2 * math.atan(math.exp(y)) - math.pi / 2)
+
+
+class SvgMapRenderer:
+    """Renders the SVG map of a country from a catalog (see geo_catalog.load_catalog)
+
+    render(iso) is cheap enough to call per request but is meant to sit behind
+    a MapCache, like generate_map in app.py.
+    """
+
+    def __init__(self, catalog, width=SVG_WIDTH, height=SVG_HEIGHT):
+        self.catalog = catalog
+        self.width = width
+        self.height = height
+        self.geometries = [geometry for geometry in catalog.values() if geometry.bounds is not None]
+        # (xmin, xmax, ymin, ymax) of every outline, for the neighbour search
+        self.boxes = np.array([geometry.bounds for geometry in self.geometries], dtype=np.float64).reshape(-1, 4)
+
+    def viewport(self, bounds):
+        """Return the (left, top, scale) projection transform and lon/lat box of a view fitted to `bounds`"""
+        xmin, xmax, ymin, ymax = bounds
+        (x0, y0), (x1, y1) = mercator(np.array([[xmin, ymin], [xmax, ymax]]))
+        dx = max(x1 - x0, 1e-6)
+        dy = max(y1 - y0, 1e-6)
+        x0, x1 = x0 - dx * SVG_MARGIN, x1 + dx * SVG_MARGIN
+        y0, y1 = y0 - dy * SVG_MARGIN, y1 + dy * SVG_MARGIN
+        scale = min(self.width / (x1 - x0), self.height / (y1 - y0))
+        # Center the country in the fixed-size image
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        x0, x1 = cx - self.width / scale / 2, cx + self.width / scale / 2
+        y0, y1 = cy - self.height / scale / 2, cy + self.height / scale / 2
+        box = (math.degrees(x0), math.degrees(x1), inverse_latitude(y0), inverse_latitude(y1))
+        return (x0, y1, scale), box
+
+    def neighbours(self, box, exclude):
+        """Return the outlines whose bounds overlap the lon/lat `box`"""
+        xmin, xmax, ymin, ymax = box
+        overlaps = (self.boxes[:, 0] <= xmax) & (self.boxes[:, 1] >= xmin) & (self.boxes[:, 2] <= ymax) & (self.boxes[:, 3] >= ymin)
+        return [self.geometries[i] for i in np.flatnonzero(overlaps) if self.geometries[i].iso != exclude]
+
+    def path(self, geometry, transform):
+        """Return the SVG path data of an outline, one subpath per ring"""
+        x0, y1, scale = transform
+        parts = []
+        for polygon in geometry.rings():
+            for ring in polygon:
+                if len(ring) < 3:
+                    continue
+                projected = mercator(ring)
+                pixels = np.empty_like(projected)
+                pixels[:, 0] = (projected[:, 0] - x0) * scale
+                pixels[:, 1] = (y1 - projected[:, 1]) * scale
+                # Skip rings entirely outside the image
+                if pixels[:, 0].max() < 0 or pixels[:, 0].min() > self.width or pixels[:, 1].max() < 0 or pixels[:, 1].min() > self.height:
+                    continue
+                pixels = np.round(pixels, 1)
+                parts.append("M" + "L".join(f"{x:g} {y:g}" for x, y in pixels.tolist()) + "Z")
+        return "".join(parts)
+
+    def render(self, country_iso):
+        geometry = self.catalog.get(country_iso.lower())
+        if geometry is None or geometry.bounds is None:
+            return "<p>Map not found</p>"
+        transform, box = self.viewport(geometry.bounds)
+        # Vertices closer together than half a pixel are dropped
+        tolerance = view_tolerance(box, pixels=self.width)
+
+        neighbours = []
+        for neighbour in self.neighbours(box, geometry.iso):
+            data = self.path(neighbour.simplify(tolerance), transform)
+            if data:
+                neighbours.append(f'<path d="{data}"/>')
+        country = self.path(geometry.simplify(tolerance), transform)
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {self.width} {self.height}" role="img" aria-label="Map">'
+            f'<rect width="{self.width}" height="{self.height}" fill="{SEA_COLOR}"/>'
+            f'<g {NEIGHBOUR_STYLE} stroke-linejoin="round" fill-rule="evenodd">{"".join(neighbours)}</g>'
+            f'<path {COUNTRY_STYLE} stroke-linejoin="round" fill-rule="evenodd" d="{country}"/>'
+            "</svg>"
+        )
@@ -0,0 +1,42 @@
+from PyQt6.QtCore import QByteArray, QRectF
+from PyQt6.QtGui import QPainter
+from PyQt6.QtSvg import QSvgRenderer
+from PyQt6.QtWidgets import QSizePolicy, QWidget
+from geo_catalog import load_catalog
+from map_cache import MapCache
+from resources import resource_path
+from svg_map import SvgMapRenderer
+
+
+class SvgMapWidget(QWidget):
+    """Offline map: the country drawn as an SVG outline, no web engine or network needed
+
+    Has the same update_map and map_cache interface as MapWidget.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.country_outlines = load_catalog(resource_path("country_outlines/countries.geojson"))
+        self.map_renderer = SvgMapRenderer(self.country_outlines)
+        self.map_cache = MapCache(self.map_renderer.render, maxsize=256, suffix=".svg")
+        self.svg_renderer = QSvgRenderer(self)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+
+    def update_map(self, country_iso):
+        self.svg_renderer.load(QByteArray(self.map_cache.get(country_iso).encode("utf-8")))
+        self.update()
+
+    def paintEvent(self, event):
+        if not self.svg_renderer.isValid():
+            return
+        # Fit the map into the widget, keeping its aspect ratio
+        view = self.svg_renderer.viewBoxF()
+        scale = min(self.width() / view.width(), self.height() / view.height())
+        width, height = view.width() * scale, view.height() * scale
+        target = QRectF((self.width() - width) / 2, (self.height() - height) / 2, width, height)
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Neighbouring outlines reach past the view box, which QSvgRenderer does not clip
+        painter.setClipRect(target)
+        self.svg_renderer.render(painter, target)
+        painter.end()